@@ -0,0 +1,163 @@
+import json
+import logging
+import math
+import os
+import numpy as np
+import pyglet
+from pyglet import gl
+from blocks import BLOCKS
+
+# Every block and item texture packed into a single image, so the world and the
+# HUD draw with one bound texture, plus UV tables to find each tile in it.
+# Packing decodes every PNG, which takes seconds for the large ones, so the
+# packed pixels are cached on disk and only rebuilt when a source file, the
+# tile size or the registered blocks change.
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TEXTURE_DIRECTORY = os.path.join(ROOT, 'textures')
+CACHE_FILE = os.path.join(ROOT, 'cache', 'atlas.npz')
+CACHE_VERSION = 1  # Bump when the packing changes
+TILE_SIZE = 32  # Every texture is scaled to this many pixels square
+BLANK = 'blank'  # White tile for blocks registered after the atlas was packed
+
+class TextureAtlas:
+    def __init__(self, pixels, names):
+        self.pixels = pixels  # [row, column, RGBA], bottom row first as GL expects
+        self.names = list(names)
+        self.tiles = {name: tile for tile, name in enumerate(self.names)}
+        self.columns = pixels.shape[1] // TILE_SIZE
+        self.uvs = self.tile_uvs()
+        self.block_table = None
+        self.texture = None  # Created on first bind, which needs a GL context
+
+    def tile_uvs(self):
+        # (u0, v0, u1, v1) of each tile, inset by half a texel so neighbouring
+        # tiles never bleed in at the edges
+        height, width = self.pixels.shape[:2]
+        tiles = np.arange(len(self.names))
+        x = (tiles % self.columns) * TILE_SIZE
+        y = (tiles // self.columns) * TILE_SIZE
+        return np.stack([(x + 0.5) / width, (y + 0.5) / height,
+                         (x + TILE_SIZE - 0.5) / width, (y + TILE_SIZE - 0.5) / height],
+                        axis=1).astype(np.float32)
+
+    def block_uvs(self):
+        # UVs indexed by block id, for the mesher. Rebuilt when blocks are
+        # registered after packing (e.g. unknown blocks in a loaded save).
+        if self.block_table is None or len(self.block_table) != len(BLOCKS):
+            tiles = [self.tiles.get(name, self.tiles[BLANK]) for name in BLOCKS.names]
+            self.block_table = self.uvs[tiles]
+        return self.block_table
+
+    def bind(self):
+        if self.texture is None:
+            height, width = self.pixels.shape[:2]
+            image = pyglet.image.ImageData(width, height, 'RGBA', self.pixels.tobytes())
+            self.texture = image.get_texture()
+            gl.glBindTexture(self.texture.target, self.texture.id)
+            gl.glTexParameteri(self.texture.target, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+            gl.glTexParameteri(self.texture.target, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+        gl.glEnable(self.texture.target)
+        gl.glBindTexture(self.texture.target, self.texture.id)
+
+    def unbind(self):
+        gl.glDisable(self.texture.target)
+
+    def draw_icons(self, icons):
+        # Draws (name, x, y, size) squares in one call; every name must have a tile
+        if not icons:
+            return
+        positions = []
+        tex_coords = []
+        for name, x, y, size in icons:
+            u0, v0, u1, v1 = self.uvs[self.tiles[name]].tolist()
+            positions.extend((x, y, x + size, y, x + size, y + size, x, y + size))
+            tex_coords.extend((u0, v0, u1, v0, u1, v1, u0, v1))
+        self.bind()
+        pyglet.graphics.draw(len(icons) * 4, gl.GL_QUADS,
+                             ('v2f', positions),
+                             ('t2f', tex_coords),
+                             ('c3f', (1, 1, 1) * (len(icons) * 4)))
+        self.unbind()
+
+def texture_sources(directory=TEXTURE_DIRECTORY):
+    # {name: path} of every PNG in the texture directory
+    return {os.path.splitext(filename)[0]: os.path.join(directory, filename)
+            for filename in sorted(os.listdir(directory)) if filename.endswith('.png')}
+
+def cache_key(sources):
+    # Changes whenever the packed atlas would
+    files = []
+    for name, path in sorted(sources.items()):
+        stat = os.stat(path)
+        files.append((name, stat.st_size, stat.st_mtime_ns))
+    return json.dumps({'version': CACHE_VERSION, 'tile_size': TILE_SIZE, 'files': files,
+                       'blocks': BLOCKS.names[1:], 'colors': BLOCKS.colors[1:].tolist()})
+
+def load_tile(path):
+    # The image at path scaled to one tile (nearest neighbour), or None if it
+    # cannot be decoded
+    try:
+        image = pyglet.image.load(path)
+    except Exception as e:
+        logging.warning(f"Could not decode texture {path}: {e}")
+        return None
+    pixels = np.frombuffer(image.get_data('RGBA', image.width * 4), dtype=np.uint8)
+    pixels = pixels.reshape(image.height, image.width, 4)
+    rows = np.arange(TILE_SIZE) * image.height // TILE_SIZE
+    columns = np.arange(TILE_SIZE) * image.width // TILE_SIZE
+    return pixels[rows[:, None], columns[None, :]]
+
+def color_tile(color):
+    tile = np.full((TILE_SIZE, TILE_SIZE, 4), 255, dtype=np.uint8)
+    tile[:, :, :3] = np.round(np.asarray(color) * 255)
+    return tile
+
+def build_atlas(sources):
+    # Packs one tile per registered block, from its texture or else filled
+    # with its flat colour, then one per remaining texture (items)
+    names = [BLANK]
+    tiles = [color_tile((1, 1, 1))]
+    for block_id, name in enumerate(BLOCKS.names[1:], 1):
+        tile = load_tile(sources[name]) if name in sources else None
+        names.append(name)
+        tiles.append(color_tile(BLOCKS.colors[block_id]) if tile is None else tile)
+    for name, path in sources.items():
+        if name not in BLOCKS:
+            tile = load_tile(path)
+            if tile is not None:
+                names.append(name)
+                tiles.append(tile)
+    # A power-of-two square grid, filled from the bottom left
+    columns = 2 ** math.ceil(math.log2(math.ceil(math.sqrt(len(tiles)))))
+    pixels = np.zeros((columns * TILE_SIZE, columns * TILE_SIZE, 4), dtype=np.uint8)
+    for tile_index, tile in enumerate(tiles):
+        y, x = divmod(tile_index, columns)
+        pixels[y * TILE_SIZE:(y + 1) * TILE_SIZE, x * TILE_SIZE:(x + 1) * TILE_SIZE] = tile
+    return TextureAtlas(pixels, names)
+
+def load_atlas(directory=TEXTURE_DIRECTORY, cache_file=CACHE_FILE):
+    sources = texture_sources(directory)
+    key = cache_key(sources)
+    try:
+        with np.load(cache_file) as cached:
+            if str(cached['key']) == key:
+                return TextureAtlas(cached['pixels'], cached['names'].tolist())
+    except (OSError, KeyError, ValueError):
+        pass  # Missing or unreadable: rebuild it
+    atlas = build_atlas(sources)
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_file = cache_file + '.tmp'
+    with open(temp_file, 'wb') as f:
+        np.savez(f, key=key, pixels=atlas.pixels, names=np.array(atlas.names))
+    os.replace(temp_file, cache_file)
+    logging.info(f"Packed {len(atlas.names)} textures into {cache_file}")
+    return atlas
+
+ATLAS = None
+
+def get_atlas():
+    # The atlas shared by everything that draws textures, loaded on first use
+    global ATLAS
+    if ATLAS is None:
+        ATLAS = load_atlas()
+    return ATLAS
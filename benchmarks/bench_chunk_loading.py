@@ -0,0 +1,61 @@
+# Fills the render window around the player through the background chunk loader
+# with different worker counts. Reports total time and the worst frame spent
+# integrating chunks, and checks every run produced identical chunks.
+# Run from the repository root: python benchmarks/bench_chunk_loading.py
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from game_world import GameWorld
+
+logging.disable(logging.CRITICAL)
+
+SEED = 1234
+WORKER_COUNTS = (0, 1, 2, 4)
+
+
+def fill_window(workers):
+    world = GameWorld(chunk_workers=workers)
+    world.seed = SEED
+    position = (0.5, 80.0, 0.5)
+    expected = (2 * world.render_distance + 1) ** 2
+    frames = 0
+    worst_frame = 0.0
+    start = time.perf_counter()
+    while len(world.chunks) < expected:
+        frame_start = time.perf_counter()
+        world.ensure_chunks_around_player(position)
+        worst_frame = max(worst_frame, time.perf_counter() - frame_start)
+        frames += 1
+        time.sleep(0.001)  # Stand-in for the rest of the frame
+    elapsed = time.perf_counter() - start
+    world.shutdown()
+    return world, elapsed, frames, worst_frame
+
+
+def main():
+    reference = None
+    print(f"{'workers':<9}{'seconds':>10}{'frames':>9}{'worst frame ms':>16}")
+    for workers in WORKER_COUNTS:
+        world, elapsed, frames, worst_frame = fill_window(workers)
+        print(f"{workers:<9}{elapsed:>10.2f}{frames:>9}{worst_frame * 1000:>16.2f}")
+        if reference is None:
+            reference = world
+            continue
+        for chunk_pos, chunk in reference.chunks.items():
+            other = world.chunks[chunk_pos]
+            if not np.array_equal(chunk.blocks, other.blocks):
+                raise SystemExit(f"Chunk {chunk_pos} differs with {workers} workers")
+    print("Chunks identical for every worker count")
+
+
+if __name__ == '__main__':
+    main()
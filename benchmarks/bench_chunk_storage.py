@@ -0,0 +1,96 @@
+# Compares the chunk block storage, dense arrays for the 16x16x16 sections that
+# hold blocks, against the old dict-of-Block layout.
+# Run from the repository root: python benchmarks/bench_chunk_storage.py
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from game_world import Chunk
+
+logging.disable(logging.CRITICAL)
+
+TERRAIN_HEIGHT = 35
+LOOKUPS = 200000
+
+
+class LegacyBlock:
+    def __init__(self, block_type):
+        self.block_type = block_type
+
+
+class LegacyChunk:
+    # The previous representation: one Block object per voxel keyed by tuple
+    def __init__(self):
+        self.blocks = {}
+
+    def add_block(self, position, block_type):
+        local = (position[0] % 16, position[1], position[2] % 16)
+        if local not in self.blocks:
+            self.blocks[local] = LegacyBlock(block_type)
+
+    def get_block(self, position):
+        local = (position[0] % 16, position[1], position[2] % 16)
+        if local in self.blocks:
+            return self.blocks[local].block_type
+        return None
+
+
+def fill(chunk):
+    for x in range(16):
+        for z in range(16):
+            for y in range(TERRAIN_HEIGHT):
+                if y == TERRAIN_HEIGHT - 1:
+                    block_type = 'grass'
+                elif y > TERRAIN_HEIGHT - 4:
+                    block_type = 'dirt'
+                else:
+                    block_type = 'stone'
+                chunk.add_block((x, y, z), block_type)
+
+
+def measure_memory(factory):
+    tracemalloc.start()
+    chunk = factory()
+    fill(chunk)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunk, current
+
+
+def measure_lookups(chunk, positions):
+    start = time.perf_counter()
+    for position in positions:
+        chunk.get_block(position)
+    elapsed = time.perf_counter() - start
+    return len(positions) / elapsed
+
+
+def main():
+    rng = random.Random(1234)
+    positions = [(rng.randrange(16), rng.randrange(64), rng.randrange(16)) for _ in range(LOOKUPS)]
+
+    # Warm up lazy imports so they are not counted against either layout
+    fill(Chunk((0, 0), None))
+
+    legacy, legacy_bytes = measure_memory(LegacyChunk)
+    dense, dense_bytes = measure_memory(lambda: Chunk((0, 0), None))
+
+    legacy_rate = measure_lookups(legacy, positions)
+    dense_rate = measure_lookups(dense, positions)
+
+    print(f"{'storage':<10}{'bytes/chunk':>14}{'lookups/s':>14}")
+    print(f"{'dict':<10}{legacy_bytes:>14,}{legacy_rate:>14,.0f}")
+    print(f"{'sections':<10}{dense_bytes:>14,}{dense_rate:>14,.0f}")
+    print(f"Memory ratio: {legacy_bytes / dense_bytes:.1f}x smaller")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Collision throughput: the old 3x5x3 GameWorld.collide probe against the swept
+# AABB resolver in physics.move, for the moves an entity makes each frame.
+# Run from the repository root: python benchmarks/bench_collision.py
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+import physics
+from game_world import GameWorld
+
+logging.disable(logging.CRITICAL)
+
+SEED = 1234
+ENTITIES = 20000
+DT = 1 / 60
+
+
+def legacy_collide(world, position):
+    # The previous GameWorld.collide: 45 get_block calls around the position
+    x, y, z = position
+    for dx in range(-1, 2):
+        for dy in range(-2, 3):
+            for dz in range(-1, 2):
+                if world.get_block((int(x + dx), int(y + dy), int(z + dz))):
+                    return True
+    return False
+
+
+def main():
+    world = GameWorld(chunk_workers=0)
+    world.seed = SEED
+    world.render_distance = 2
+    world.ensure_chunks_around_player((0, 0, 0), blocking=True)
+
+    rng = random.Random(SEED)
+    entities = []
+    for _ in range(ENTITIES):
+        x, z = rng.uniform(-30, 30), rng.uniform(-30, 30)
+        motion = (rng.uniform(-1, 1) * 5 * DT, -9.8 * DT * DT, rng.uniform(-1, 1) * 5 * DT)
+        entities.append(([x, world.get_height(x, z) + 1, z], motion))
+
+    start = time.perf_counter()
+    for position, (dx, dy, dz) in entities:
+        # Player.move used to probe once per axis
+        legacy_collide(world, (position[0] + dx, position[1], position[2]))
+        legacy_collide(world, (position[0], position[1] + dy, position[2]))
+        legacy_collide(world, (position[0], position[1], position[2] + dz))
+    legacy_rate = ENTITIES / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for position, motion in entities:
+        physics.move(world, position, 0.6, 1.8, motion)
+    swept_rate = ENTITIES / (time.perf_counter() - start)
+
+    print(f"{'collision':<10}{'moves/s':>12}")
+    print(f"{'legacy':<10}{legacy_rate:>12,.0f}")
+    print(f"{'swept':<10}{swept_rate:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
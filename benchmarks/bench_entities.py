@@ -0,0 +1,66 @@
+# Entity queries: a linear scan over every mob, as Player.attack and
+# Game.handle_mob_interactions used to do, against the EntityIndex grid, for
+# growing mob counts spread over the loaded area.
+# Run from the repository root: python benchmarks/bench_entities.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from entities import EntityIndex
+from mobs import Sheep, Zombie
+
+SEED = 1234
+COUNTS = (100, 1000, 10000)
+QUERIES = 2000
+RADIUS = 4
+AREA = 128
+
+
+def linear_radius(mobs, position, radius):
+    return [mob for mob in mobs if mob.distance_to(position) <= radius]
+
+
+def linear_nearest(mobs, position, kind):
+    candidates = [mob for mob in mobs if isinstance(mob, kind)]
+    return min(candidates, key=lambda mob: mob.distance_to(position), default=None)
+
+
+def main():
+    rng = random.Random(SEED)
+    print(f"{'mobs':>8}{'scan q/s':>14}{'grid q/s':>14}{'scan nearest/s':>16}{'grid nearest/s':>16}")
+    for count in COUNTS:
+        mobs = [(Sheep if i % 2 else Zombie)((rng.uniform(-AREA, AREA), 64, rng.uniform(-AREA, AREA)))
+                for i in range(count)]
+        index = EntityIndex()
+        for mob in mobs:
+            index.update(mob)
+        points = [(rng.uniform(-AREA, AREA), 64, rng.uniform(-AREA, AREA)) for _ in range(QUERIES)]
+
+        start = time.perf_counter()
+        scan = [len(linear_radius(mobs, p, RADIUS)) for p in points]
+        scan_rate = QUERIES / (time.perf_counter() - start)
+        start = time.perf_counter()
+        grid = [len(index.query_radius(p, RADIUS)) for p in points]
+        grid_rate = QUERIES / (time.perf_counter() - start)
+        assert scan == grid
+
+        start = time.perf_counter()
+        for p in points:
+            linear_nearest(mobs, p, Zombie)
+        scan_nearest_rate = QUERIES / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for p in points:
+            index.nearest(p, Zombie, max_radius=4 * AREA)
+        grid_nearest_rate = QUERIES / (time.perf_counter() - start)
+
+        print(f"{count:>8}{scan_rate:>14,.0f}{grid_rate:>14,.0f}{scan_nearest_rate:>16,.0f}{grid_nearest_rate:>16,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Compares the chunk mesh modes on the same terrain: quad count and build time
+# for a whole chunk, and for what one block edit remeshes: the whole 256-high
+# column as a single mesh, as chunks used to be meshed, against just the
+# 16x16x16 section holding the block.
+# Meshing runs through the pure meshing.build_mesh, so no window is needed.
+# Run from the repository root: python benchmarks/bench_meshing.py
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+import numpy as np
+
+from blocks import BLOCKS
+from game_world import CHUNK_SIZE, SECTION_COUNT, SECTION_SIZE, GameWorld
+from meshing import MESH_MODES, build_mesh
+
+logging.disable(logging.CRITICAL)
+
+SEED = 1234
+REPEATS = 20
+
+
+def main():
+    world = GameWorld()
+    world.seed = SEED
+    for cx in range(-1, 2):
+        for cz in range(-1, 2):
+            world.generate_chunk(cx, cz)
+    chunk = world.chunks[(0, 0)]
+    inputs = [section.mesh_input() for section in chunk.sections.values()]
+    column = (chunk.blocks, inputs[0][1], inputs[0][2], column_borders(world, chunk))
+    edited = chunk.sections[world.get_height(0, 0) // SECTION_SIZE].mesh_input()
+
+    print(f"{len(chunk.sections)} of {SECTION_COUNT} sections hold blocks")
+    print(f"{'mode':<8}{'quads':>10}{'vertices':>12}{'ms/chunk':>12}{'ms/column':>12}{'ms/section':>12}")
+    for mode in MESH_MODES:
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            meshes = [build_mesh(*mesh_input[:5], mode) for mesh_input in inputs]
+        elapsed = (time.perf_counter() - start) / REPEATS
+        column_time = timed(lambda: build_mesh(*column, mode=mode))
+        section_time = timed(lambda: build_mesh(*edited[:5], mode))
+        quads = sum(mesh.quad_count for mesh in meshes)
+        vertices = sum(mesh.vertex_count for mesh in meshes)
+        print(f"{mode:<8}{quads:>10,}{vertices:>12,}{elapsed * 1000:>12.2f}"
+              f"{column_time * 1000:>12.2f}{section_time * 1000:>12.2f}")
+
+
+def timed(build):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        build()
+    return (time.perf_counter() - start) / REPEATS
+
+
+def column_borders(world, chunk):
+    # Neighbour slabs for meshing the whole column at once
+    cx, cz = chunk.position
+    borders = []
+    for chunk_pos, edge in (((cx - 1, cz), (-1, slice(None), slice(None))),
+                            ((cx + 1, cz), (0, slice(None), slice(None))),
+                            ((cx, cz - 1), (slice(None), slice(None), -1)),
+                            ((cx, cz + 1), (slice(None), slice(None), 0))):
+        neighbour = world.chunks[chunk_pos]
+        borders.append(BLOCKS.opaque[neighbour.blocks[edge]])
+    return tuple(borders) + (np.ones((CHUNK_SIZE, CHUNK_SIZE), dtype=bool), None)
+
+
+if __name__ == '__main__':
+    main()
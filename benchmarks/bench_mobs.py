@@ -0,0 +1,84 @@
+# Mob simulation cost per tick: updating every mob object on its own, as
+# Game.update used to, against MobManager advancing each kind in vectorized
+# steps over its arrays, every tick or with the distance-tiered TickScheduler.
+# Run from the repository root: python benchmarks/bench_mobs.py
+import logging
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from game_world import GameWorld
+from mobs import MobManager, Sheep, TickScheduler, Zombie
+from player import Player
+
+logging.disable(logging.CRITICAL)
+
+SEED = 1234
+MOBS = 10000
+TICKS = 60
+DT = 1 / 60
+AREA = 60
+
+
+def spawn(world, rng):
+    mobs = []
+    for i in range(MOBS):
+        x, z = rng.uniform(-AREA, AREA), rng.uniform(-AREA, AREA)
+        mob_class = Sheep if i % 2 else Zombie
+        mobs.append(mob_class((x, world.get_height(x, z) + 1, z)))
+    return mobs
+
+
+def main():
+    world = GameWorld(chunk_workers=0)
+    world.seed = SEED
+    world.render_distance = 4
+    world.ensure_chunks_around_player((0, 0, 0), blocking=True)
+    player = Player([0.5, world.get_height(0, 0) + 1, 0.5])
+    player.health = float('inf')  # Keep the player alive through every zombie attack
+    world.entities.update(player)
+
+    random.seed(SEED)
+    mobs = spawn(world, random.Random(SEED))
+    for mob in mobs:
+        world.entities.update(mob)
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        for mob in mobs:
+            mob.update(DT, world, player)
+    per_object = (time.perf_counter() - start) / TICKS
+
+    results = {}
+    for name, tiers in (('batched', (('all', math.inf, 1),)), ('tiered', None)):
+        world.entities.clear()
+        world.entities.update(player)
+        random.seed(SEED)
+        manager = MobManager(world, seed=SEED)
+        if tiers is not None:
+            manager.scheduler = TickScheduler(tiers)
+        for mob in spawn(world, random.Random(SEED)):
+            manager.add(mob)
+        start = time.perf_counter()
+        for _ in range(TICKS):
+            manager.update(DT, [player])
+        results[name] = (time.perf_counter() - start) / TICKS
+        if tiers is None:
+            tier_counts = {name: tier['mobs'] for name, tier in manager.scheduler.stats.items()}
+
+    print(f"{MOBS} mobs, tick budget {DT * 1000:.1f} ms")
+    print(f"{'update':<12}{'ms/tick':>10}{'ticks/s':>10}")
+    print(f"{'per object':<12}{per_object * 1000:>10.1f}{1 / per_object:>10.1f}")
+    for name, per_tick in results.items():
+        print(f"{name:<12}{per_tick * 1000:>10.1f}{1 / per_tick:>10.1f}")
+    print("tiers: " + ", ".join(f"{name} {count}" for name, count in tier_counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# Horde pathfinding: every zombie in a horde searching its own path to the
+# player, against the shared PathFinder growing one search tree from the player
+# under a per-tick node and time budget, whose worst tick must fit in a game tick.
+# Run from the repository root: python benchmarks/bench_pathfinding.py
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from game_world import GameWorld
+from pathfinding import PathFinder
+from timestep import TICK_RATE
+
+logging.disable(logging.CRITICAL)
+
+SEED = 1234
+HORDE = 300
+SPREAD = 20
+
+
+def main():
+    world = GameWorld(chunk_workers=0)
+    world.seed = SEED
+    world.render_distance = 3
+    world.ensure_chunks_around_player((0, 0, 0), blocking=True)
+    goal = (0.5, world.get_height(0, 0) + 1, 0.5)
+
+    rng = random.Random(SEED)
+    starts = []
+    for _ in range(HORDE):
+        x, z = rng.randint(-SPREAD, SPREAD), rng.randint(-SPREAD, SPREAD)
+        starts.append((x + 0.5, world.get_height(x, z) + 1, z + 0.5))
+
+    # Every zombie searches on its own, with no budget
+    pathfinder = PathFinder(world, tick_budget=float('inf'))
+    start = time.perf_counter()
+    found = 0
+    for position in starts:
+        pathfinder.clear()
+        found += pathfinder.find_path(position, goal) is not None
+    separate_time = time.perf_counter() - start
+    separate_nodes = pathfinder.stats['nodes']
+
+    # Shared cache: the horde asks once per tick until everyone has a route
+    pathfinder = PathFinder(world)
+    goal_cell = pathfinder.ground(goal)
+    waiting = list(starts)
+    ticks = 0
+    max_tick_time = 0.0
+    start = time.perf_counter()
+    while waiting:
+        tick_start = time.perf_counter()
+        pathfinder.new_tick()
+        # Keep asking while the search is still in progress
+        waiting = [position for position in waiting
+                   if pathfinder.find_path(position, goal) is None
+                   and pathfinder.ground(position) in pathfinder.trees[goal_cell].waiting]
+        max_tick_time = max(max_tick_time, time.perf_counter() - tick_start)
+        ticks += 1
+    shared_time = time.perf_counter() - start
+    stats = pathfinder.stats
+
+    print(f"{HORDE} zombies within {SPREAD} blocks of the player, {found} reachable")
+    print(f"{'search':<10}{'nodes':>10}{'ms total':>10}{'ms/tick max':>13}{'ticks':>7}")
+    print(f"{'separate':<10}{separate_nodes:>10}{separate_time * 1000:>10.1f}{separate_time * 1000:>13.1f}{1:>7}")
+    print(f"{'shared':<10}{stats['nodes']:>10}{shared_time * 1000:>10.1f}{max_tick_time * 1000:>13.1f}{ticks:>7}")
+    print(f"shared: {stats['searches']} searches, {stats['cache_hits']} cache hits, {stats['deferred']} deferred")
+    tick_length = 1 / TICK_RATE
+    verdict = "fits in" if max_tick_time < tick_length else "OVERRUNS"
+    print(f"worst shared tick {max_tick_time * 1000:.1f} ms {verdict} a {tick_length * 1000:.1f} ms tick")
+    return max_tick_time < tick_length
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,73 @@
+# Chunk generation throughput: the old per-column generator against the batched one.
+# Also checks that both produce identical blocks for the same seed.
+# Run from the repository root: python benchmarks/bench_terrain.py
+import logging
+import os
+import sys
+import time
+
+import noise
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from blocks import BLOCKS
+from game_world import Chunk, GameWorld
+
+logging.disable(logging.CRITICAL)
+
+SEED = 1234
+CHUNKS = [(cx, cz) for cx in range(-3, 3) for cz in range(-3, 3)]
+
+
+def legacy_generate_chunk(world, cx, cz):
+    # The previous generator: two scalar noise calls and one add_block per voxel
+    world.chunks[(cx, cz)] = Chunk((cx, cz), world)
+    for x in range(16):
+        for z in range(16):
+            world_x = cx * 16 + x
+            world_z = cz * 16 + z
+            height = int(noise.pnoise2(world_x / 50, world_z / 50, octaves=6, persistence=0.5, lacunarity=2.0, repeatx=1024, repeaty=1024, base=world.seed) * 30 + 35)
+            for y in range(height):
+                if y == height - 1:
+                    block_type = 'grass' if noise.pnoise2(world_x / 100, world_z / 100, octaves=3, base=world.seed) > 0 else 'sand'
+                elif y > height - 4:
+                    block_type = 'dirt'
+                else:
+                    block_type = 'stone'
+                world.add_block((world_x, y, world_z), block_type)
+
+
+def run(generate):
+    world = GameWorld()
+    world.seed = SEED
+    start = time.perf_counter()
+    for cx, cz in CHUNKS:
+        generate(world, cx, cz)
+    elapsed = time.perf_counter() - start
+    return world, len(CHUNKS) / elapsed
+
+
+def block_types(chunk):
+    return np.array(BLOCKS.names, dtype=object)[chunk.blocks]
+
+
+def main():
+    legacy, legacy_rate = run(legacy_generate_chunk)
+    batched, batched_rate = run(GameWorld.generate_chunk)
+
+    for chunk_pos in CHUNKS:
+        if not (block_types(legacy.chunks[chunk_pos]) == block_types(batched.chunks[chunk_pos])).all():
+            raise SystemExit(f"Chunk {chunk_pos} differs between generators")
+
+    print(f"{'generator':<10}{'chunks/s':>12}")
+    print(f"{'legacy':<10}{legacy_rate:>12.1f}")
+    print(f"{'batched':<10}{batched_rate:>12.1f}")
+    print(f"Speed-up: {batched_rate / legacy_rate:.1f}x, output identical for seed {SEED}")
+
+
+if __name__ == '__main__':
+    main()
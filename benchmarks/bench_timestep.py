@@ -0,0 +1,114 @@
+# Simulation loop: stepping the player and mobs once per frame with the frame
+# time, as Game.update used to be scheduled, against FixedTimestep ticks.
+# Frames take a jittery 5-50 ms with occasional 300 ms stalls. Fixed ticks
+# give the same simulation as perfectly steady frames and a bounded number of
+# ticks per frame; variable steps drift with the frame times.
+# Run from the repository root: python benchmarks/bench_timestep.py
+import collections
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+from pyglet.window import key
+
+from game_world import GameWorld
+from mobs import MobManager, Sheep, Zombie
+from player import Player
+from timestep import FixedTimestep
+
+logging.disable(logging.CRITICAL)
+
+SEED = 1234
+MOBS = 200
+SECONDS = 10
+AREA = 40
+
+
+class Simulation:
+    def __init__(self, world):
+        world.entities.clear()
+        world.pathfinder.clear()
+        self.world = world
+        self.player = Player([0.5, world.get_height(0, 0) + 1, 0.5])
+        self.player.health = float('inf')
+        world.entities.update(self.player)
+        self.keys = collections.defaultdict(bool, {key.W: True})  # Walk forward
+        self.mobs = MobManager(world, seed=SEED)
+        random.seed(SEED)  # Mobs pick their update intervals with random
+        rng = random.Random(SEED)
+        for i in range(MOBS):
+            x, z = rng.uniform(-AREA, AREA), rng.uniform(-AREA, AREA)
+            self.mobs.add((Sheep if i % 2 else Zombie)((x, world.get_height(x, z) + 1, z)))
+        self.tick_times = []
+
+    def update(self, dt):
+        start = time.perf_counter()
+        self.player.update(dt, self.keys, self.world)
+        self.mobs.update(dt, [self.player])
+        self.world.ensure_chunks_around_player(self.player.position, blocking=True)
+        self.tick_times.append(time.perf_counter() - start)
+
+    def state(self):
+        return [self.player.position] + [list(mob.position) for mob in self.mobs]
+
+
+def frame_times(seed):
+    rng = random.Random(seed)
+    elapsed = 0.0
+    while elapsed < SECONDS:
+        dt = 0.3 if rng.random() < 0.01 else rng.uniform(0.005, 0.05)
+        elapsed += dt
+        yield dt
+
+
+def divergence(a, b):
+    return max(max(abs(p - q) for p, q in zip(u, v)) for u, v in zip(a, b))
+
+
+def main():
+    world = GameWorld(chunk_workers=0)
+    world.seed = SEED
+    world.render_distance = 3
+    world.ensure_chunks_around_player((0, 0, 0), blocking=True)
+
+    # Reference: perfectly steady 60 Hz frames
+    reference = Simulation(world)
+    for _ in range(SECONDS * 60):
+        reference.update(1 / 60)
+    expected = reference.state()
+
+    rows = []
+    variable = Simulation(world)
+    for dt in frame_times(SEED):
+        variable.update(dt)
+    rows.append(('variable', variable, len(variable.tick_times), 1, divergence(variable.state(), expected)))
+
+    fixed = Simulation(world)
+    timestep = FixedTimestep(fixed.update)
+    frames = 0
+    most = 0
+    for dt in frame_times(SEED):
+        most = max(most, timestep.advance(dt))
+        frames += 1
+    # Catching up after stalls drops time, so compare at the same tick count
+    reference = Simulation(world)
+    for _ in range(timestep.ticks):
+        reference.update(timestep.dt)
+    rows.append(('fixed', fixed, frames, most, divergence(fixed.state(), reference.state())))
+
+    print(f"{MOBS} mobs, {SECONDS} s of jittery frames")
+    print(f"{'loop':<10}{'frames':>8}{'ticks':>7}{'max/frame':>11}{'ms/tick max':>13}{'divergence':>12}")
+    for name, simulation, frame_count, per_frame, drift in rows:
+        print(f"{name:<10}{frame_count:>8}{len(simulation.tick_times):>7}{per_frame:>11}"
+              f"{max(simulation.tick_times) * 1000:>13.1f}{drift:>12.4f}")
+    print(f"fixed: {timestep.dropped:.2f} s dropped catching up")
+
+
+if __name__ == '__main__':
+    main()
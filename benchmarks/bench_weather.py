@@ -0,0 +1,71 @@
+# Weather particles per frame: moving one Python object per particle, as
+# WeatherSystem used to, against the array-backed ring buffer, which updates
+# the vertex array drawn in a single call in place.
+# Run from the repository root: python benchmarks/bench_weather.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from weather import WeatherSystem
+
+SEED = 1234
+FRAMES = 120
+DT = 1 / 60
+COUNTS = (1000, 10000, 50000)
+
+
+class LegacyParticle:
+    def __init__(self, x, y, z, speed):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.speed = speed
+
+    def update(self, dt):
+        self.y -= self.speed * dt
+        if self.y < 0:
+            self.y = 20
+
+
+def bench_legacy(count):
+    rng = random.Random(SEED)
+    particles = [LegacyParticle(rng.uniform(-20, 20), rng.uniform(0, 20), rng.uniform(-20, 20), rng.uniform(7, 13))
+                 for _ in range(count)]
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        particles = [p for p in particles if p.y > 0]
+        for particle in particles:
+            particle.update(DT)
+    return (time.perf_counter() - start) / FRAMES
+
+
+def bench_arrays(count):
+    random.seed(SEED)
+    weather = WeatherSystem(None, capacity=count)
+    weather.weather_type = 'rain'
+    weather.weather_intensity = 1.0
+    position = [0.5, 40.0, 0.5]
+    weather.update_particles(DT, position)
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        position[0] += 0.1  # The player walks through the rain
+        weather.update_particles(DT, position)
+    return (time.perf_counter() - start) / FRAMES, weather.particle_count
+
+
+def main():
+    print(f"{'particles':>10}{'legacy ms':>11}{'arrays ms':>11}{'alive':>8}")
+    for count in COUNTS:
+        legacy = bench_legacy(count)
+        arrays, alive = bench_arrays(count)
+        print(f"{count:>10}{legacy * 1000:>11.2f}{arrays * 1000:>11.2f}{alive:>8}")
+
+
+if __name__ == '__main__':
+    main()
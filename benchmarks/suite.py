@@ -0,0 +1,287 @@
+# Headless benchmark suite for the hot paths of the world, meshing, physics,
+# mobs and persistence. Needs no window or GPU, and every benchmark uses fixed
+# seeds, so two runs on the same machine measure the same work. Results are
+# written as JSON and can be compared against a stored baseline: a benchmark
+# whose best round got slower than the baseline by more than the threshold counts
+# as a regression and the run exits with status 1.
+# Run from the repository root:
+#   python benchmarks/suite.py                        run and compare with the baseline
+#   python benchmarks/suite.py --output results.json  also write the results
+#   python benchmarks/suite.py --save-baseline        make these results the baseline
+#   python benchmarks/suite.py --only mobs meshing    only these groups
+import argparse
+import contextlib
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pyglet
+pyglet.options['shadow_window'] = False
+from pyglet.math import Vec3
+
+from game_world import GameWorld
+from meshing import build_mesh
+from mobs import MobManager, Sheep, Zombie
+from player import Player
+from save_load import SaveLoadManager
+from timestep import TICK_RATE
+
+logging.disable(logging.CRITICAL)
+
+SEED = 1234
+REPEAT = 5  # Timed rounds per benchmark
+# Slowdown of the best round over the baseline's counted as a regression. The
+# best round is compared, as timeit advises, since noise only ever adds time.
+THRESHOLD = 0.25
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+MOB_POPULATIONS = (100, 1000, 5000)
+SAVE_DISTANCES = (1, 2, 4)  # Render distances of the saved worlds: 9, 25 and 81 chunks
+DT = 1 / TICK_RATE  # One simulation tick, as the game steps it
+
+
+def make_world(render_distance=2, seed=SEED):
+    random.seed(seed)
+    world = GameWorld(chunk_workers=0)
+    world.seed = seed
+    world.regenerate()
+    world.render_distance = render_distance
+    world.ensure_chunks_around_player((0, 0, 0), blocking=True)
+    return world
+
+
+def time_rounds(run, operations, repeat):
+    # Seconds per operation for each of `repeat` calls of run(), which
+    # performs `operations` operations
+    rounds = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            rounds.append((time.perf_counter() - start) / operations)
+    finally:
+        gc.enable()
+    return rounds
+
+
+def surface_points(world, count, rng, area=24):
+    points = []
+    for _ in range(count):
+        x, z = rng.uniform(-area, area), rng.uniform(-area, area)
+        points.append((x, world.get_height(x, z) + rng.uniform(-1, 2), z))
+    return points
+
+
+def bench_generate_chunk(repeat):
+    world = make_world(render_distance=0)
+    positions = [(x, z) for x in range(4) for z in range(4)]
+
+    def run():
+        world.regenerate()
+        for cx, cz in positions:
+            world.generate_chunk(cx, cz)
+    return {'world.generate_chunk': ('ms', time_rounds(run, len(positions), repeat))}
+
+
+def bench_meshing(repeat):
+    # Vertex generation only: the mesher's inputs are gathered up front
+    world = make_world()
+    sections = [section for chunk in world.chunks.values() for section in chunk.sections.values()]
+    results = {}
+    for mode in ('culled', 'greedy'):
+        inputs = [section.mesh_input(mode) for section in sections]
+
+        def run():
+            for mesh_input in inputs:
+                build_mesh(*mesh_input)
+        results[f'meshing.{mode}'] = ('ms', time_rounds(run, len(inputs), repeat))
+    return results
+
+
+def bench_collide(repeat):
+    world = make_world()
+    points = surface_points(world, 10000, random.Random(SEED))
+
+    def run():
+        for point in points:
+            world.collide(point)
+    return {'world.collide': ('us', time_rounds(run, len(points), repeat))}
+
+
+def bench_targeted_block(repeat):
+    world = make_world()
+    rng = random.Random(SEED)
+    players = []
+    for x, y, z in surface_points(world, 2000, rng):
+        player = Player([x, y, z])
+        player.rotation = Vec3(rng.uniform(-90, 30), rng.uniform(0, 360), 0)
+        players.append(player)
+
+    def run():
+        for player in players:
+            player.get_targeted_block(world)
+    return {'player.get_targeted_block': ('us', time_rounds(run, len(players), repeat))}
+
+
+def bench_get_height(repeat):
+    world = make_world()
+    rng = random.Random(SEED)
+    points = [(rng.uniform(-40, 40), rng.uniform(-40, 40)) for _ in range(10000)]
+
+    def run():
+        for x, z in points:
+            world.get_height(x, z)
+    return {'world.get_height': ('us', time_rounds(run, len(points), repeat))}
+
+
+def bench_mobs(repeat):
+    world = make_world(render_distance=3)
+    player = Player([0.5, world.get_height(0, 0) + 1, 0.5])
+    player.health = float('inf')  # Survives every zombie attack
+    results = {}
+    for population in MOB_POPULATIONS:
+        world.entities.clear()
+        world.entities.update(player)
+        rng = random.Random(SEED)
+        random.seed(SEED)
+        manager = MobManager(world, seed=SEED)
+        for i in range(population):
+            x, z = rng.uniform(-40, 40), rng.uniform(-40, 40)
+            manager.add((Sheep if i % 2 else Zombie)((x, world.get_height(x, z) + 1, z)))
+        ticks = 20
+
+        def run():
+            for _ in range(ticks):
+                manager.update(DT, [player])
+        results[f'mobs.update.{population}'] = ('ms', time_rounds(run, ticks, repeat))
+    return results
+
+
+def bench_save_load(repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        for distance in SAVE_DISTANCES:
+            world = make_world(render_distance=distance)
+            player = Player([0.5, world.get_height(0, 0) + 2, 0.5])
+            mobs = MobManager(world, seed=SEED)
+            for i in range(20):
+                mobs.add(Sheep((i, world.get_height(i, 0) + 1, 0)))
+            filename = os.path.join(directory, f'save_{distance}.json')
+            chunks = len(world.chunks)
+
+            def save():
+                # Every chunk edited, so each save writes the whole world
+                for chunk in world.chunks.values():
+                    chunk.modified = True
+                SaveLoadManager.save_game(player, world, mobs, filename)
+            results[f'save.{chunks}_chunks'] = ('ms', time_rounds(save, 1, repeat))
+
+            loaded_world = make_world(render_distance=0)
+            loaded_world.render_distance = distance
+            loaded_player = Player([0, 0, 0])
+            game = types.SimpleNamespace(mobs=MobManager(loaded_world, seed=SEED))
+
+            def load():
+                save_data = SaveLoadManager.load_game(filename)
+                SaveLoadManager.apply_loaded_data(save_data, loaded_player, loaded_world, game)
+            results[f'load.{chunks}_chunks'] = ('ms', time_rounds(load, 1, repeat))
+            world.shutdown()
+            loaded_world.shutdown()
+    return results
+
+
+BENCHMARKS = {
+    'generate': bench_generate_chunk,
+    'meshing': bench_meshing,
+    'collide': bench_collide,
+    'raycast': bench_targeted_block,
+    'height': bench_get_height,
+    'mobs': bench_mobs,
+    'persistence': bench_save_load,
+}
+SCALES = {'ms': 1e3, 'us': 1e6}
+
+
+def machine():
+    return {'platform': platform.platform(), 'processor': platform.processor() or platform.machine(),
+            'python': platform.python_version(), 'numpy': np.__version__, 'pyglet': pyglet.version}
+
+
+def run_suite(repeat=REPEAT, groups=None):
+    benchmarks = {}
+    for group, bench in BENCHMARKS.items():
+        if groups and group not in groups:
+            continue
+        for name, (unit, rounds) in bench(repeat).items():
+            values = [seconds * SCALES[unit] for seconds in rounds]
+            benchmarks[name] = {'unit': f'{unit}/op', 'median': statistics.median(values),
+                                'min': min(values), 'max': max(values), 'rounds': len(values)}
+            print(f"{name:<28}{benchmarks[name]['min']:>12.3f} {unit}/op", flush=True)
+    return {'seed': SEED, 'machine': machine(), 'benchmarks': benchmarks}
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # Prints each benchmark against the baseline; returns the names that regressed
+    if baseline['machine'] != results['machine']:
+        print("Warning: the baseline was recorded on a different machine or setup")
+    regressions = []
+    print(f"\n{'benchmark':<28}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, current in results['benchmarks'].items():
+        previous = baseline['benchmarks'].get(name)
+        if previous is None or previous['unit'] != current['unit']:
+            print(f"{name:<28}{'-':>12}{current['min']:>12.3f}{'new':>9}")
+            continue
+        change = current['min'] / previous['min'] - 1
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"{name:<28}{previous['min']:>12.3f}{current['min']:>12.3f}{change:>+9.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless SandhuCraft benchmark suite")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="timed rounds per benchmark")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="only run these groups")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline JSON to compare with")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="slowdown counted as a regression, as a fraction (0.25 = 25%%)")
+    parser.add_argument('--save-baseline', action='store_true', help="write the results as the baseline")
+    args = parser.parse_args()
+
+    results = run_suite(args.repeat, args.only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import logging
+import numpy as np
+
+class BlockRegistry:
+    # Every block type, numbered from 1 (0 is air) so block arrays hold small
+    # integers, with per-type properties kept as flat tables indexed by id:
+    #   solid: entities collide with it
+    #   transparent: does not hide the faces of blocks behind it
+    #   opaque: a block that hides the faces next to it (air is not)
+    #   colors: (r, g, b) drawn for the block
+    #   hardness: multiplier on the time it takes to mine
+    #   light: light level it emits, 0-15
+    # Ids only mean something within one run; anything written out stores block
+    # names alongside the ids (see remap).
+    def __init__(self):
+        self.names = [None]
+        self.ids = {None: 0}
+        self.properties = [(False, True, (0, 0, 0), 0.0, 0)]  # Air
+        self.build_tables()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def register(self, name, solid=True, transparent=False, color=(1, 1, 1), hardness=1.0, light=0):
+        if name in self.ids:
+            raise ValueError(f"Block {name} is already registered")
+        block_id = len(self.names)
+        if block_id > np.iinfo(np.uint8).max:
+            raise ValueError(f"Too many block types to register {name}")
+        self.names.append(name)
+        self.ids[name] = block_id
+        self.properties.append((solid, transparent, color, hardness, light))
+        self.build_tables()
+        return block_id
+
+    def build_tables(self):
+        # Tables are replaced rather than changed in place, so a copy handed to
+        # a mesh worker stays valid
+        solid, transparent, colors, hardness, light = zip(*self.properties)
+        self.solid = np.array(solid, dtype=bool)
+        self.transparent = np.array(transparent, dtype=bool)
+        self.opaque = ~self.transparent
+        self.colors = np.array(colors, dtype=np.float32)
+        self.hardness = np.array(hardness, dtype=np.float32)
+        self.light = np.array(light, dtype=np.uint8)
+
+    def remap(self, names):
+        # Lookup table from ids in data saved with the given names list to ids
+        # in this registry. Blocks no longer registered are added with default
+        # properties so their data is not lost.
+        table = np.zeros(len(names), dtype=np.uint8)
+        for old_id, name in enumerate(names):
+            if name not in self.ids:
+                logging.warning(f"Unknown block type {name} in saved data, registering it")
+                self.register(name)
+            table[old_id] = self.ids[name]
+        return table
+
+    def convert(self, blocks, names):
+        # blocks saved with the given names list, as ids in this registry
+        if names == self.names[:len(names)]:
+            return blocks.astype(np.uint8, copy=False)  # Saved with the same numbering
+        return self.remap(names)[blocks]
+
+BLOCKS = BlockRegistry()
+# Terrain blocks come first so generated chunks keep the ids they always had
+AIR = 0
+STONE = BLOCKS.register('stone', color=(0.5, 0.5, 0.5), hardness=2.0)
+DIRT = BLOCKS.register('dirt', color=(0.5, 0.25, 0), hardness=1.0)
+GRASS = BLOCKS.register('grass', color=(0, 0.8, 0), hardness=1.0)
+SAND = BLOCKS.register('sand', color=(0.76, 0.7, 0.5), hardness=1.0)
+BLOCKS.register('water', solid=False, transparent=True, color=(0.2, 0.4, 0.9), hardness=0.0)
+BLOCKS.register('lava', solid=False, transparent=True, color=(1.0, 0.4, 0.0), hardness=0.0, light=15)
+BLOCKS.register('wood', color=(0.4, 0.3, 0.15), hardness=1.5)
+BLOCKS.register('leaves', transparent=True, color=(0.1, 0.5, 0.1), hardness=0.5)
+BLOCKS.register('glass', transparent=True, color=(0.8, 0.9, 0.95), hardness=0.5)
+BLOCKS.register('cobblestone', color=(0.45, 0.45, 0.45), hardness=2.0)
+BLOCKS.register('wooden_planks', color=(0.7, 0.55, 0.3), hardness=1.5)
+BLOCKS.register('coal_ore', color=(0.3, 0.3, 0.3), hardness=3.0)
+BLOCKS.register('iron_ore', color=(0.6, 0.5, 0.45), hardness=3.0)
+BLOCKS.register('gold_ore', color=(0.8, 0.7, 0.2), hardness=3.0)
+BLOCKS.register('diamond_ore', color=(0.4, 0.8, 0.8), hardness=3.0)
+BLOCKS.register('furnace', color=(0.35, 0.35, 0.35), hardness=3.5)
+BLOCKS.register('crafting_table', color=(0.6, 0.4, 0.2), hardness=2.5)
+BLOCKS.register('chest', color=(0.55, 0.4, 0.2), hardness=2.5)
+BLOCKS.register('torch', solid=False, transparent=True, color=(1.0, 0.9, 0.4), hardness=0.0, light=14)
+# Fluid spreading from a water or lava source (see fluids.py)
+BLOCKS.register('flowing_water', solid=False, transparent=True, color=(0.25, 0.45, 0.9), hardness=0.0)
+BLOCKS.register('flowing_lava', solid=False, transparent=True, color=(0.95, 0.35, 0.0), hardness=0.0, light=7)
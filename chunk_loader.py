@@ -0,0 +1,86 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+class ChunkLoader:
+    # Generates chunks off the main thread, nearest to the player first.
+    # `generate` must be a pure function of (seed, cx, cz) so the result does not
+    # depend on how many workers run or in which order they finish.
+    # With workers=0 chunks are generated inline on the calling thread.
+    def __init__(self, generate, workers=None, use_processes=True):
+        self.generate = generate
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 2) - 1)
+        self.workers = workers
+        self.use_processes = use_processes
+        self.executor = None
+        self.queue = []  # Heap of (distance, chunk_pos) waiting to be submitted
+        self.queued = set()
+        self.pending = {}  # chunk_pos -> future
+        self.center = None
+
+    def request(self, missing, center):
+        # `missing` is every chunk the world wants but does not have yet. When the
+        # player moves to a new chunk, anything no longer wanted is dropped and
+        # the rest is re-prioritised around the new center.
+        if center != self.center:
+            self.center = center
+            wanted = set(missing)
+            self.queue = [(self.distance(chunk_pos), chunk_pos) for _, chunk_pos in self.queue
+                          if chunk_pos in wanted]
+            heapq.heapify(self.queue)
+            self.queued = {chunk_pos for _, chunk_pos in self.queue}
+            for chunk_pos in [chunk_pos for chunk_pos in self.pending if chunk_pos not in wanted]:
+                self.pending.pop(chunk_pos).cancel()
+        for chunk_pos in missing:
+            if chunk_pos not in self.queued and chunk_pos not in self.pending:
+                heapq.heappush(self.queue, (self.distance(chunk_pos), chunk_pos))
+                self.queued.add(chunk_pos)
+
+    def distance(self, chunk_pos):
+        dx = chunk_pos[0] - self.center[0]
+        dz = chunk_pos[1] - self.center[1]
+        return dx * dx + dz * dz
+
+    def completed(self, seed):
+        # Yields finished (chunk_pos, blocks, names) results, nearest first.
+        # Callers stop iterating when their frame budget runs out; anything not
+        # consumed stays queued for the next call.
+        if self.workers == 0:
+            while self.queue:
+                _, chunk_pos = heapq.heappop(self.queue)
+                self.queued.discard(chunk_pos)
+                yield (chunk_pos, *self.generate(seed, *chunk_pos))
+            return
+
+        if self.executor is None:
+            executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self.executor = executor_class(max_workers=self.workers)
+        while self.queue and len(self.pending) < self.workers * 2:
+            _, chunk_pos = heapq.heappop(self.queue)
+            self.queued.discard(chunk_pos)
+            self.pending[chunk_pos] = self.executor.submit(self.generate, seed, *chunk_pos)
+
+        done = sorted((self.distance(chunk_pos), chunk_pos)
+                      for chunk_pos, future in self.pending.items() if future.done())
+        for _, chunk_pos in done:
+            future = self.pending.pop(chunk_pos)
+            if not future.cancelled():
+                yield (chunk_pos, *future.result())
+
+    def busy(self):
+        return bool(self.queue or self.pending)
+
+    def clear(self):
+        self.queue = []
+        self.queued.clear()
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.center = None
+
+    def shutdown(self):
+        self.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,91 @@
+import numpy as np
+
+def frustum_planes(projection, modelview):
+    # Extracts the six clip planes (left, right, bottom, top, near, far) from
+    # column-major GL matrices as rows of (a, b, c, d) with unit-length normals,
+    # so a point p is inside a plane when a*p.x + b*p.y + c*p.z + d >= 0.
+    clip = (np.asarray(projection, dtype=np.float64).reshape(4, 4).T
+            @ np.asarray(modelview, dtype=np.float64).reshape(4, 4).T)
+    planes = np.array([clip[3] + clip[0], clip[3] - clip[0],
+                       clip[3] + clip[1], clip[3] - clip[1],
+                       clip[3] + clip[2], clip[3] - clip[2]])
+    return planes / np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+class ChunkBounds:
+    # World-space AABBs of every loaded chunk section packed into one array, so
+    # the frustum test runs over all of them in a single vectorized pass. Keys
+    # are section keys, (chunk x, section index, chunk z).
+    def __init__(self, capacity=512):
+        self.boxes = np.zeros((capacity, 6), dtype=np.float64)  # min xyz, max xyz
+        self.empty = np.ones(capacity, dtype=bool)
+        self.keys = []  # Slot -> section key
+        self.slots = {}  # Section key -> slot
+
+    def __len__(self):
+        return len(self.keys)
+
+    def set(self, key, box):
+        # box is (min_point, max_point) in world coordinates, or None for a
+        # section without blocks
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = len(self.keys)
+            if slot == len(self.boxes):
+                self.boxes = np.concatenate([self.boxes, np.zeros_like(self.boxes)])
+                self.empty = np.concatenate([self.empty, np.ones_like(self.empty)])
+            self.keys.append(key)
+            self.slots[key] = slot
+        if box is None:
+            self.empty[slot] = True
+        else:
+            self.boxes[slot, :3], self.boxes[slot, 3:] = box
+            self.empty[slot] = False
+
+    def include(self, key, position):
+        # Grows the box of a section to cover the voxel at position. Boxes never
+        # shrink on removal; a loose box is still correct to cull with.
+        if key not in self.slots:
+            self.set(key, None)
+        slot = self.slots[key]
+        low = np.asarray(position, dtype=np.float64)
+        if self.empty[slot]:
+            self.boxes[slot, :3] = low
+            self.boxes[slot, 3:] = low + 1
+            self.empty[slot] = False
+        else:
+            np.minimum(self.boxes[slot, :3], low, out=self.boxes[slot, :3])
+            np.maximum(self.boxes[slot, 3:], low + 1, out=self.boxes[slot, 3:])
+
+    def remove(self, key):
+        # Moves the last slot into the freed one to keep the arrays packed
+        slot = self.slots.pop(key, None)
+        if slot is None:
+            return
+        last = len(self.keys) - 1
+        if slot != last:
+            last_key = self.keys[last]
+            self.boxes[slot] = self.boxes[last]
+            self.empty[slot] = self.empty[last]
+            self.keys[slot] = last_key
+            self.slots[last_key] = slot
+        self.keys.pop()
+        self.empty[last] = True
+
+    def clear(self):
+        self.keys.clear()
+        self.slots.clear()
+        self.empty[:] = True
+
+    def visible(self, planes):
+        # Returns the keys of sections whose box is at least partly inside all six
+        # planes. Each box is tested with its corner furthest along the plane
+        # normal (the "positive vertex").
+        count = len(self.keys)
+        if not count:
+            return []
+        boxes = self.boxes[:count]
+        normals = planes[:, :3]
+        positive = np.where(normals[None, :, :] >= 0, boxes[:, None, 3:], boxes[:, None, :3])
+        distances = (positive * normals[None, :, :]).sum(axis=2) + planes[None, :, 3]
+        inside = (distances >= 0).all(axis=1) & ~self.empty[:count]
+        return [self.keys[slot] for slot in np.flatnonzero(inside).tolist()]
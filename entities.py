@@ -0,0 +1,125 @@
+import math
+
+class EntityIndex:
+    # Uniform grid over the x/z plane for finding entities near a point without
+    # scanning all of them. Anything with a `position` (feet) and optionally
+    # `width` and `height` can be indexed; call update() whenever an entity
+    # moves, and remove() when it leaves the world.
+    def __init__(self, cell_size=8):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_z) -> {entity: None}, ordered for deterministic queries
+        self.entity_cells = {}  # entity -> (cell_x, cell_z)
+
+    def __len__(self):
+        return len(self.entity_cells)
+
+    def __contains__(self, entity):
+        return entity in self.entity_cells
+
+    def cell(self, x, z):
+        return (math.floor(x / self.cell_size), math.floor(z / self.cell_size))
+
+    def update(self, entity):
+        # Inserts the entity, or moves it to its new cell if it changed
+        cell = self.cell(entity.position[0], entity.position[2])
+        old_cell = self.entity_cells.get(entity)
+        if old_cell == cell:
+            return
+        if old_cell is not None:
+            self.discard(entity, old_cell)
+        self.cells.setdefault(cell, {})[entity] = None
+        self.entity_cells[entity] = cell
+
+    def remove(self, entity):
+        cell = self.entity_cells.pop(entity, None)
+        if cell is not None:
+            self.discard(entity, cell)
+
+    def discard(self, entity, cell):
+        members = self.cells[cell]
+        del members[entity]
+        if not members:
+            del self.cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.entity_cells.clear()
+
+    def in_cells(self, low_x, low_z, high_x, high_z, kind=None):
+        # Entities in every cell overlapping the x/z rectangle
+        cell_x0, cell_z0 = self.cell(low_x, low_z)
+        cell_x1, cell_z1 = self.cell(high_x, high_z)
+        if (cell_x1 - cell_x0 + 1) * (cell_z1 - cell_z0 + 1) > len(self.cells):
+            # Cheaper to walk the occupied cells than the whole rectangle
+            cells = [members for (cx, cz), members in self.cells.items()
+                     if cell_x0 <= cx <= cell_x1 and cell_z0 <= cz <= cell_z1]
+        else:
+            cells = [self.cells[(cx, cz)]
+                     for cx in range(cell_x0, cell_x1 + 1)
+                     for cz in range(cell_z0, cell_z1 + 1) if (cx, cz) in self.cells]
+        for members in cells:
+            for entity in members:
+                if kind is None or isinstance(entity, kind):
+                    yield entity
+
+    def query_radius(self, position, radius, kind=None):
+        # Entities whose position is within radius of position, optionally only
+        # instances of kind (a class or tuple of classes)
+        x, y, z = position
+        radius_sq = radius * radius
+        return [entity for entity in self.in_cells(x - radius, z - radius, x + radius, z + radius, kind)
+                if distance_sq(entity.position, position) <= radius_sq]
+
+    def query_aabb(self, low, high, kind=None):
+        # Entities whose box overlaps the box from low to high. Entities are
+        # indexed by their centre, so the search is widened by a block to catch
+        # boxes reaching in from a neighbouring cell.
+        found = []
+        for entity in self.in_cells(low[0] - 1, low[2] - 1, high[0] + 1, high[2] + 1, kind):
+            half = getattr(entity, 'width', 0) / 2
+            x, y, z = entity.position
+            if (x - half < high[0] and x + half > low[0] and
+                    y < high[1] and y + getattr(entity, 'height', 0) > low[1] and
+                    z - half < high[2] and z + half > low[2]):
+                found.append(entity)
+        return found
+
+    def nearest(self, position, kind=None, max_radius=32, exclude=None):
+        # Closest entity within max_radius, searching rings of cells outwards and
+        # stopping once no unsearched cell can hold anything closer
+        x, y, z = position
+        center_x, center_z = self.cell(x, z)
+        best = None
+        best_sq = max_radius * max_radius
+        for ring in range(math.ceil(max_radius / self.cell_size) + 1):
+            if best is not None and (ring - 1) * self.cell_size >= math.sqrt(best_sq):
+                break
+            if best is None and (2 * ring + 1) ** 2 > len(self.cells):
+                # Searched more cells than are occupied without a match, so
+                # checking the remaining candidates directly is cheaper
+                candidates = [entity for entity in self.query_radius(position, max_radius, kind)
+                              if entity is not exclude]
+                return min(candidates, key=lambda entity: distance_sq(entity.position, position), default=None)
+            for cell in ring_cells(center_x, center_z, ring):
+                for entity in self.cells.get(cell, ()):
+                    if entity is exclude or (kind is not None and not isinstance(entity, kind)):
+                        continue
+                    d = distance_sq(entity.position, position)
+                    if d <= best_sq:
+                        best, best_sq = entity, d
+        return best
+
+def distance_sq(a, b):
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+def ring_cells(center_x, center_z, ring):
+    # Cells at Chebyshev distance `ring` from the center cell
+    if ring == 0:
+        yield (center_x, center_z)
+        return
+    for dx in range(-ring, ring + 1):
+        yield (center_x + dx, center_z - ring)
+        yield (center_x + dx, center_z + ring)
+    for dz in range(-ring + 1, ring):
+        yield (center_x - ring, center_z + dz)
+        yield (center_x + ring, center_z + dz)
@@ -0,0 +1,186 @@
+import heapq
+import numpy as np
+from blocks import AIR, BLOCKS
+
+# Water and lava flow as a cellular automaton that only ever looks at active
+# cells: fluid next to a block edit, or next to a cell the simulation changed
+# itself. Each tick updates at most `budget` of them and the rest wait for the
+# next tick, so a flood spreads over more ticks rather than stalling one.
+# Sources stay put; flowing cells hold their distance from a source in
+# `levels` and dry up when nothing feeds them any more.
+FLUID_BUDGET = 512  # Most cells updated in one tick
+SIDES = ((1, 0, 0), (-1, 0, 0), (0, 0, 1), (0, 0, -1))
+NEIGHBOURS = SIDES + ((0, 1, 0), (0, -1, 0))
+
+class Fluid:
+    def __init__(self, source, flowing, reach, delay):
+        self.source = BLOCKS.ids[source]
+        self.flowing = BLOCKS.ids[flowing]
+        self.flowing_type = flowing
+        self.reach = reach  # How far it spreads sideways from where it lands
+        self.delay = delay  # Ticks between steps of its flow
+
+WATER = Fluid('water', 'flowing_water', reach=7, delay=5)
+LAVA = Fluid('lava', 'flowing_lava', reach=3, delay=30)
+FLUIDS = {WATER.source: WATER, WATER.flowing: WATER, LAVA.source: LAVA, LAVA.flowing: LAVA}
+FLOWING_IDS = np.array([WATER.flowing, LAVA.flowing])
+HARDENED = 'cobblestone'  # What lava turns into where water touches it
+
+class FluidSimulation:
+    def __init__(self, world, chunk_size, chunk_height, budget=FLUID_BUDGET):
+        self.world = world
+        self.chunk_size = chunk_size
+        self.chunk_height = chunk_height
+        self.budget = budget
+        self.tick = 0
+        self.queue = []  # Heap of (due tick, position) for active cells
+        self.queued = {}  # position -> due tick of its live queue entry
+        self.levels = {}  # Flowing cell -> distance from its source, 0 when falling
+        self.updated = 0  # Cells updated in the last tick
+
+    @property
+    def active(self):
+        return len(self.queued)
+
+    def clear(self):
+        self.queue.clear()
+        self.queued.clear()
+        self.levels.clear()
+
+    def loaded(self, position):
+        x, y, z = position
+        return 0 <= y < self.chunk_height and (x // self.chunk_size, z // self.chunk_size) in self.world.chunks
+
+    def enqueue(self, position, delay):
+        due = self.tick + delay
+        if self.queued.get(position, due + 1) <= due:
+            return  # Already due as soon
+        self.queued[position] = due
+        heapq.heappush(self.queue, (due, position))
+
+    def block_changed(self, position):
+        # Wakes the fluid at and around an edited block
+        x, y, z = position
+        if self.world.get_block_id(position) not in (WATER.flowing, LAVA.flowing):
+            self.levels.pop(position, None)
+        for dx, dy, dz in ((0, 0, 0),) + NEIGHBOURS:
+            cell = (x + dx, y + dy, z + dz)
+            fluid = FLUIDS.get(self.world.get_block_id(cell))
+            if fluid is not None:
+                self.enqueue(cell, fluid.delay)
+
+    def chunk_loaded(self, chunk):
+        # Flowing fluid saved mid-flow picks up where it left off. Its levels
+        # were not saved, so it starts at full strength and settles as its
+        # neighbours are updated; fluid no source feeds drains away.
+        origin_x, origin_z = chunk.position[0] * self.chunk_size, chunk.position[1] * self.chunk_size
+        for index in chunk.sections:
+            blocks = chunk.section_data[chunk.section_slots[index]]
+            xs, ys, zs = np.nonzero(np.isin(blocks, FLOWING_IDS))
+            base_y = index * blocks.shape[1]
+            for x, y, z in zip(xs.tolist(), ys.tolist(), zs.tolist()):
+                position = (origin_x + x, base_y + y, origin_z + z)
+                self.levels[position] = 0
+                self.enqueue(position, FLUIDS[chunk.get_block_id(position)].delay)
+
+    def chunk_unloaded(self, chunk_pos):
+        # Forgets the chunk's cells; they are found again if it is reloaded
+        def outside(position):
+            return (position[0] // self.chunk_size, position[2] // self.chunk_size) != chunk_pos
+        self.levels = {position: level for position, level in self.levels.items() if outside(position)}
+        self.queued = {position: due for position, due in self.queued.items() if outside(position)}
+
+    def update(self):
+        # One tick: updates due cells up to the budget, then applies all the
+        # changes they made at once so light and meshes are updated once
+        self.tick += 1
+        changes = {}
+        updated = 0
+        while self.queue and self.queue[0][0] <= self.tick and updated < self.budget:
+            due, position = heapq.heappop(self.queue)
+            if self.queued.get(position) != due:
+                continue  # Superseded by an earlier entry, or unloaded
+            del self.queued[position]
+            self.update_cell(position, changes)
+            updated += 1
+        self.updated = updated
+        if changes:
+            self.world.replace_blocks(changes)
+            for position in changes:
+                self.block_changed(position)
+
+    def update_cell(self, position, changes):
+        world = self.world
+        block_id = world.get_block_id(position)
+        fluid = FLUIDS.get(block_id)
+        if fluid is None or not self.loaded(position):
+            return
+        x, y, z = position
+        if fluid is LAVA and any(FLUIDS.get(world.get_block_id((x + dx, y + dy, z + dz))) is WATER
+                                 for dx, dy, dz in NEIGHBOURS):
+            changes[position] = HARDENED
+            return
+        level = 0
+        if block_id == fluid.flowing:
+            level = self.support(position, fluid)
+            if level is None:
+                changes[position] = None  # Dried up
+                return
+            if level != self.levels.get(position):
+                self.levels[position] = level
+                for dx, dy, dz in NEIGHBOURS:
+                    neighbour = (x + dx, y + dy, z + dz)
+                    if FLUIDS.get(world.get_block_id(neighbour)) is fluid:
+                        self.enqueue(neighbour, fluid.delay)
+        # Falls if it can, otherwise spreads sideways up to its reach
+        below = (x, y - 1, z)
+        below_id = world.get_block_id(below) if y > 0 else None
+        if below_id == AIR:
+            self.flow(below, fluid, 0, changes)
+            return
+        if below_id == fluid.flowing:
+            if self.levels.get(below):
+                self.enqueue(below, fluid.delay)  # Now falling, so full strength
+            return
+        if level >= fluid.reach:
+            return
+        for dx, dy, dz in SIDES:
+            side = (x + dx, y, z + dz)
+            side_id = world.get_block_id(side)
+            if side_id == AIR:
+                self.flow(side, fluid, level + 1, changes)
+            elif side_id == fluid.flowing and self.levels.get(side, 0) > level + 1:
+                self.enqueue(side, fluid.delay)  # Fed more strongly from here
+            elif side_id in FLUIDS and FLUIDS[side_id] is not fluid:
+                self.enqueue(side, FLUIDS[side_id].delay)  # Water and lava meet
+
+    def flow(self, position, fluid, level, changes):
+        if self.loaded(position) and position not in changes:
+            changes[position] = fluid.flowing_type
+            self.levels[position] = level
+
+    def support(self, position, fluid):
+        # Level a flowing cell is fed at, or None if nothing feeds it: falling
+        # fluid from above, else one more than the strongest neighbour
+        # resting on something beside it
+        world = self.world
+        x, y, z = position
+        if FLUIDS.get(world.get_block_id((x, y + 1, z))) is fluid:
+            return 0
+        strongest = None
+        for dx, dy, dz in SIDES:
+            side = (x + dx, y, z + dz)
+            side_id = world.get_block_id(side)
+            if side_id == fluid.source:
+                level = 0
+            elif side_id == fluid.flowing:
+                level = self.levels.get(side, 0)
+            else:
+                continue
+            if y > 0 and world.get_block_id((x + dx, y - 1, z + dz)) in (AIR, fluid.flowing):
+                continue  # That neighbour falls rather than spreading
+            if strongest is None or level < strongest:
+                strongest = level
+        if strongest is None or strongest + 1 > fluid.reach:
+            return None
+        return strongest + 1
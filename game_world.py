@@ -1,246 +1,714 @@
+import math
 import random
 import pyglet
 import noise
-from pyglet.math import Vec3, Mat4
+import numpy as np
+from pyglet.math import Mat4
 from pyglet import gl
 import os
-import logging
+import time
+import physics
+from chunk_loader import ChunkLoader
+from meshing import MESH_MODES, build_mesh
+from culling import ChunkBounds, frustum_planes
+from entities import EntityIndex
+from fluids import FluidSimulation
+from lighting import MAX_LIGHT, SKY, LightEngine
+from pathfinding import PathFinder
+from profiler import PROFILER
+from atlas import get_atlas
+from blocks import AIR, BLOCKS, DIRT, GRASS, SAND, STONE
+from concurrent.futures import ThreadPoolExecutor
 
-logging.basicConfig(level=logging.DEBUG)
+CHUNK_SIZE = 16
+CHUNK_HEIGHT = 256
+SECTION_SIZE = 16  # Chunks are split vertically into cubic sections
+SECTION_SHIFT = 4  # log2(SECTION_SIZE)
+SECTION_COUNT = CHUNK_HEIGHT // SECTION_SIZE
+# Light of sections holding no light values of their own, shared by every
+# chunk and never written to: open to the sky throughout, and completely dark
+SKY_SLOT, DARK_SLOT = 0, 1
+SHARED_LIGHT = np.stack([np.full((CHUNK_SIZE, SECTION_SIZE, CHUNK_SIZE), MAX_LIGHT << SKY, dtype=np.uint8),
+                         np.zeros((CHUNK_SIZE, SECTION_SIZE, CHUNK_SIZE), dtype=np.uint8)])
 
-class Block:
-    def __init__(self, block_type):
-        self.block_type = block_type
+def terrain_maps(seed, cx, cz):
+    # Height and surface maps for one chunk, indexed as [x, z]
+    world_xs = range(cx * CHUNK_SIZE, (cx + 1) * CHUNK_SIZE)
+    world_zs = range(cz * CHUNK_SIZE, (cz + 1) * CHUNK_SIZE)
+    heights = np.array([[int(noise.pnoise2(world_x / 50, world_z / 50, octaves=6, persistence=0.5, lacunarity=2.0, repeatx=1024, repeaty=1024, base=seed) * 30 + 35)
+                         for world_z in world_zs] for world_x in world_xs], dtype=np.int32)
+    grass = np.array([[noise.pnoise2(world_x / 100, world_z / 100, octaves=3, base=seed) > 0
+                       for world_z in world_zs] for world_x in world_xs], dtype=bool)
+    return heights, grass
+
+def generate_terrain(seed, cx, cz):
+    # Fills a whole chunk from its height and surface maps in one pass.
+    # Returns the block array and the block names its ids stand for, ready for
+    # Chunk.set_blocks.
+    heights, grass = terrain_maps(seed, cx, cz)
+    ys = np.arange(CHUNK_HEIGHT)[None, :, None]
+    tops = heights[:, None, :] - 1
+    blocks = np.zeros((CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_SIZE), dtype=np.uint8)
+    blocks[ys < tops - 2] = STONE
+    blocks[(ys >= tops - 2) & (ys < tops)] = DIRT
+    surface = np.where(grass, GRASS, SAND)[:, None, :]
+    np.copyto(blocks, surface.astype(np.uint8), where=(ys == tops))
+    return blocks, list(BLOCKS.names)
 
 class Chunk:
     def __init__(self, position, world):
         self.position = position
         self.world = world
-        self.blocks = {}
-        self.bounding_box = None
-        self.batch = pyglet.graphics.Batch()
-        self.needs_update = True
-        self.rendered_vertices = 0
+        # Blocks are stored per 16x16x16 section, only for sections holding any.
+        # section_data stacks those sections, each indexed as [x, y, z] with y
+        # local to the section, after a shared all-air section in slot 0;
+        # section_slots maps each section index (y // SECTION_SIZE) to its slot,
+        # 0 for an all-air section. Each cell holds a block id from the
+        # BLOCKS registry, where 0 is air.
+        self.section_data = np.zeros((1, CHUNK_SIZE, SECTION_SIZE, CHUNK_SIZE), dtype=np.uint8)
+        self.section_slots = np.zeros(SECTION_COUNT, dtype=np.int64)
+        self.sections = {}  # Section index -> Section, for sections holding blocks
+        # y of the highest solid block in each [x, z] column, -1 for none;
+        # water, torches and the like are not stood on, so do not count
+        self.heightmap = np.full((CHUNK_SIZE, CHUNK_SIZE), -1, dtype=np.int16)
+        # Packed skylight and block light of every voxel (see lighting.py),
+        # stored per section like blocks: light_slots maps each section index
+        # to its slot in light_data, where sections open to the sky or
+        # completely dark share the slots of SHARED_LIGHT
+        self.light_data = SHARED_LIGHT
+        self.light_slots = np.full(SECTION_COUNT, SKY_SLOT, dtype=np.int64)
+        self.modified = False  # Edited since it was generated or last saved
+
+    @property
+    def blocks(self):
+        # The whole column as a new dense [x, y, z] array
+        sections = self.section_data[self.section_slots]
+        return sections.transpose(1, 0, 2, 3).reshape(CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_SIZE)
+
+    def set_blocks(self, blocks, names):
+        # Replaces the whole chunk contents in bulk from a dense [x, y, z] array
+        # of ids standing for the given block names, e.g. as saved
+        blocks = BLOCKS.convert(blocks, names)
+        sections = blocks.reshape(CHUNK_SIZE, SECTION_COUNT, SECTION_SIZE, CHUNK_SIZE).transpose(1, 0, 2, 3)
+        filled = np.flatnonzero(sections.any(axis=(1, 2, 3)))
+        self.section_data = np.concatenate([np.zeros((1,) + sections.shape[1:], dtype=blocks.dtype),
+                                            sections[filled]])
+        self.section_slots = np.zeros(SECTION_COUNT, dtype=np.int64)
+        self.section_slots[filled] = np.arange(1, len(filled) + 1)
+        self.sections = {index: Section(self, index) for index in filled.tolist()}
+        self.heightmap = self.calculate_heightmap(blocks)
+
+    @property
+    def light(self):
+        # Light of the whole column as a new dense [x, y, z] array
+        sections = self.light_data[self.light_slots]
+        return sections.transpose(1, 0, 2, 3).reshape(CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_SIZE)
+
+    def light_range(self, low, high):
+        # Light of layers low to high - 1 as a dense [x, y, z] array, read
+        # from only the sections holding them
+        first, last = low >> SECTION_SHIFT, (high - 1) >> SECTION_SHIFT
+        sections = self.light_data[self.light_slots[first:last + 1]]
+        column = sections.transpose(1, 0, 2, 3).reshape(CHUNK_SIZE, -1, CHUNK_SIZE)
+        offset = first * SECTION_SIZE
+        return column[:, low - offset:high - offset]
+
+    def set_light(self, light):
+        # Replaces the light of the whole chunk from a dense [x, y, z] array
+        sections = light.reshape(CHUNK_SIZE, SECTION_COUNT, SECTION_SIZE, CHUNK_SIZE).transpose(1, 0, 2, 3)
+        sky = (sections == SHARED_LIGHT[SKY_SLOT]).all(axis=(1, 2, 3))
+        dark = ~sections.any(axis=(1, 2, 3))
+        own = np.flatnonzero(~sky & ~dark)
+        self.light_slots = np.where(sky, SKY_SLOT, DARK_SLOT)
+        self.light_slots[own] = np.arange(len(SHARED_LIGHT), len(SHARED_LIGHT) + len(own))
+        self.light_data = np.concatenate([SHARED_LIGHT, sections[own]])
+
+    def light_value(self, x, y, z):
+        # Packed light at local coordinates
+        return self.light_data.item(self.light_slots.item(y >> SECTION_SHIFT), x, y & (SECTION_SIZE - 1), z)
+
+    def set_light_value(self, x, y, z, value):
+        index = y >> SECTION_SHIFT
+        slot = self.light_slots.item(index)
+        if slot < len(SHARED_LIGHT):
+            # Shared: the section gets a copy of its own to change
+            self.light_data = np.concatenate([self.light_data, self.light_data[slot:slot + 1]])
+            slot = self.light_slots[index] = len(self.light_data) - 1
+        self.light_data[slot, x, y & (SECTION_SIZE - 1), z] = value
+
+    def calculate_heightmap(self, blocks):
+        solid = BLOCKS.solid[blocks]
+        tops = CHUNK_HEIGHT - 1 - np.argmax(solid[:, ::-1, :], axis=1)
+        return np.where(solid.any(axis=1), tops, -1).astype(np.int16)
+
+    def block_ids(self, x, y, z):
+        # Block ids at local coordinates; scalars or arrays of equal shape
+        return self.section_data[self.section_slots[y >> SECTION_SHIFT], x, y & (SECTION_SIZE - 1), z]
+
+    def add_section(self, index):
+        self.section_data = np.concatenate([self.section_data, np.zeros_like(self.section_data[:1])])
+        self.section_slots[index] = len(self.section_data) - 1
+        section = self.sections[index] = Section(self, index)
+        return section
+
+    def remove_section(self, index):
+        # Frees the storage of a section that no longer holds any blocks
+        slot = self.section_slots[index]
+        self.section_data = np.delete(self.section_data, slot, axis=0)
+        self.section_slots[index] = 0
+        self.section_slots[self.section_slots > slot] -= 1
+        del self.sections[index]
 
     def add_block(self, position, block_type):
-        local_x, local_y, local_z = (p % 16 for p in position)
-        if (local_x, local_y, local_z) not in self.blocks:
-            self.blocks[(local_x, local_y, local_z)] = Block(block_type)
-            self.needs_update = True
-            logging.debug(f"Added block {block_type} at {position}")
+        # Returns the Section the block went into, or None if it was not placed
+        x, y, z = position
+        block_id = BLOCKS.ids.get(block_type)
+        if not block_id or not 0 <= y < CHUNK_HEIGHT:
+            return None  # Not a block, e.g. an item
+        local_x, local_z = x % CHUNK_SIZE, z % CHUNK_SIZE
+        if self.block_ids(local_x, y, local_z) != 0:
+            return None
+        index = y >> SECTION_SHIFT
+        section = self.sections.get(index) or self.add_section(index)
+        self.section_data[self.section_slots[index], local_x, y & (SECTION_SIZE - 1), local_z] = block_id
+        if y > self.heightmap[local_x, local_z] and BLOCKS.solid.item(block_id):
+            self.heightmap[local_x, local_z] = y
+        section.needs_update = True
+        self.modified = True
+        return section
 
     def remove_block(self, position):
-        local_x, local_y, local_z = (p % 16 for p in position)
-        if (local_x, local_y, local_z) in self.blocks:
-            removed_type = self.blocks[(local_x, local_y, local_z)].block_type
-            del self.blocks[(local_x, local_y, local_z)]
-            self.needs_update = True
-            logging.debug(f"Removed block {removed_type} at {position}")
+        x, y, z = position
+        if not 0 <= y < CHUNK_HEIGHT:
+            return None
+        local_x, local_z = x % CHUNK_SIZE, z % CHUNK_SIZE
+        block_id = self.block_ids(local_x, y, local_z)
+        if block_id:
+            removed_type = BLOCKS.names[block_id]
+            index = y >> SECTION_SHIFT
+            section_blocks = self.section_data[self.section_slots[index]]
+            section_blocks[local_x, y & (SECTION_SIZE - 1), local_z] = 0
+            if not section_blocks.any():
+                self.remove_section(index)
+            else:
+                self.sections[index].needs_update = True
+            if y == self.heightmap[local_x, local_z]:
+                column = self.section_data[self.section_slots, local_x, :, local_z].reshape(-1)
+                below = np.flatnonzero(BLOCKS.solid[column[:y]])
+                self.heightmap[local_x, local_z] = below[-1] if len(below) else -1
+            self.modified = True
             return removed_type
         return None
 
+    def get_block_id(self, position):
+        # Scalar lookup; item() skips building numpy scalars on this hot path
+        x, y, z = position
+        if not 0 <= y < CHUNK_HEIGHT:
+            return AIR
+        slot = self.section_slots.item(y >> SECTION_SHIFT)
+        if not slot:
+            return AIR
+        return self.section_data.item(slot, x % CHUNK_SIZE, y & (SECTION_SIZE - 1), z % CHUNK_SIZE)
+
     def get_block(self, position):
-        local_x, local_y, local_z = (p % 16 for p in position)
-        if (local_x, local_y, local_z) in self.blocks:
-            return self.blocks[(local_x, local_y, local_z)].block_type
-        return None
-    
+        return BLOCKS.names[self.get_block_id(position)]
+
+    def iter_blocks(self):
+        # Yields ((x, y, z), block_type) in chunk-local coordinates
+        for index in sorted(self.sections):
+            blocks = self.section_data[self.section_slots[index]]
+            xs, ys, zs = np.nonzero(blocks)
+            ids = blocks[xs, ys, zs]
+            base_y = index * SECTION_SIZE
+            for x, y, z, block_id in zip(xs.tolist(), ys.tolist(), zs.tolist(), ids.tolist()):
+                yield (x, base_y + y, z), BLOCKS.names[block_id]
+
+class Section:
+    # Render state of one 16x16x16 section of a chunk that holds blocks: its
+    # own mesh, rebuilt only when a block in or next to it changes. All-air
+    # sections have no Section at all.
+    def __init__(self, chunk, index):
+        self.chunk = chunk
+        self.index = index  # Covers y from index * SECTION_SIZE
+        self.key = (chunk.position[0], index, chunk.position[1])
+        self.batch = pyglet.graphics.Batch()
+        self.needs_update = True
+        self.rendered_vertices = 0
+        self.quad_count = 0
+        self.mesh_time = 0.0
+        self.mesh_future = None
+
+    @property
+    def blocks(self):
+        return self.chunk.section_data[self.chunk.section_slots[self.index]]
+
+    def border_opacity(self):
+        # Opacity of the neighbouring sections' slabs touching this section, as
+        # (west, east, north, south, below, above); None where the neighbour
+        # holds no blocks or is not loaded
+        cx, cz = self.chunk.position
+        chunks = self.chunk.world.chunks
+        borders = []
+        for chunk_pos, index, edge in (((cx - 1, cz), self.index, (-1, slice(None), slice(None))),
+                                       ((cx + 1, cz), self.index, (0, slice(None), slice(None))),
+                                       ((cx, cz - 1), self.index, (slice(None), slice(None), -1)),
+                                       ((cx, cz + 1), self.index, (slice(None), slice(None), 0)),
+                                       ((cx, cz), self.index - 1, (slice(None), -1, slice(None))),
+                                       ((cx, cz), self.index + 1, (slice(None), 0, slice(None)))):
+            neighbour = chunks.get(chunk_pos)
+            section = neighbour.sections.get(index) if neighbour is not None else None
+            borders.append(None if section is None else BLOCKS.opaque[section.blocks[edge]])
+        if self.index == 0:
+            # The underside of the world is never visible
+            borders[4] = np.ones((CHUNK_SIZE, CHUNK_SIZE), dtype=bool)
+        return tuple(borders)
+
+    def mesh_input(self, mode=None):
+        # A snapshot of everything build_mesh needs, safe to hand to a worker
+        world = self.chunk.world
+        return (self.blocks.copy(), get_atlas().block_uvs(), BLOCKS.opaque, self.border_opacity(),
+                world.lighting.section_levels(self.chunk, self.index), mode or world.mesh_mode)
+
+    def build_mesh(self, mode=None):
+        return build_mesh(*self.mesh_input(mode))
+
     def update_mesh(self):
         if not self.needs_update:
             return
+        self.upload_mesh(self.build_mesh())
+
+    def upload_mesh(self, mesh):
+        # Must run on the GL thread
+        start = time.perf_counter()
+        PROFILER.add_time('meshing', mesh.build_time)
+        PROFILER.count('sections meshed')
         self.batch = pyglet.graphics.Batch()
-        self.bounding_box = self.calculate_bounding_box()
-        self.rendered_vertices = 0
-        vertex_count = 0
-        for (x, y, z), block in self.blocks.items():
-            color = self.world.textures[block.block_type]
-            vertices = [
-                x, y, z,    x+1, y, z,    x+1, y+1, z,    x, y+1, z,  # Front face
-                x, y, z+1,  x+1, y, z+1,  x+1, y+1, z+1,  x, y+1, z+1,  # Back face
-                x, y, z,    x, y, z+1,    x, y+1, z+1,    x, y+1, z,  # Left face
-                x+1, y, z,  x+1, y+1, z,  x+1, y+1, z+1,  x+1, y, z+1,  # Right face
-                x, y+1, z,  x+1, y+1, z,  x+1, y+1, z+1,  x, y+1, z+1,  # Top face
-                x, y, z,    x+1, y, z,    x+1, y, z+1,    x, y, z+1,  # Bottom face
-            ]
-            colors = color * 24  # 6 faces * 4 vertices per face
-            self.batch.add(24, gl.GL_QUADS, None,
-                           ('v3f', vertices),
-                           ('c3f', colors))
-            vertex_count += 24
-        self.rendered_vertices = vertex_count
-        logging.debug(f"Updated chunk mesh at {self.position} with {vertex_count} vertices.")
+        if mesh.vertex_count:
+            self.batch.add(mesh.vertex_count, gl.GL_QUADS, None,
+                           ('v3f', mesh.positions.tolist()),
+                           ('t2f', mesh.tex_coords.tolist()),
+                           ('c3f', mesh.colors.tolist()),
+                           ('n3f', mesh.normals.tolist()))
+        self.rendered_vertices = mesh.vertex_count
+        self.quad_count = mesh.quad_count
+        PROFILER.add_time('mesh upload', time.perf_counter() - start)
+        self.mesh_time = mesh.build_time + time.perf_counter() - start
         self.needs_update = False
 
     def calculate_bounding_box(self):
-        if not self.blocks:
+        # World-space (min, max) corners around the section's blocks, or None if empty
+        xs, ys, zs = np.nonzero(self.blocks)
+        if not len(xs):
             return None
-        min_x = min_y = min_z = float('inf')
-        max_x = max_y = max_z = float('-inf')
-        for x, y, z in self.blocks.keys():
-            min_x = min(min_x, x)
-            min_y = min(min_y, y)
-            min_z = min(min_z, z)
-            max_x = max(max_x, x + 1)
-            max_y = max(max_y, y + 1)
-            max_z = max(max_z, z + 1)
-        return (Vec3(min_x, min_y, min_z), Vec3(max_x, max_y, max_z))
-
-    def is_visible(self, frustum):
-        if not self.bounding_box:
-            return False
-        min_point, max_point = self.bounding_box
-        for i in range(6):
-            out = 0
-            out += (frustum[i].dot(Vec3(min_point.x, min_point.y, min_point.z)) < 0.0) 
-            out += (frustum[i].dot(Vec3(max_point.x, min_point.y, min_point.z)) < 0.0) 
-            out += (frustum[i].dot(Vec3(min_point.x, max_point.y, min_point.z)) < 0.0) 
-            out += (frustum[i].dot(Vec3(max_point.x, max_point.y, min_point.z)) < 0.0) 
-            out += (frustum[i].dot(Vec3(min_point.x, min_point.y, max_point.z)) < 0.0) 
-            out += (frustum[i].dot(Vec3(max_point.x, min_point.y, max_point.z)) < 0.0) 
-            out += (frustum[i].dot(Vec3(min_point.x, max_point.y, max_point.z)) < 0.0) 
-            out += (frustum[i].dot(Vec3(max_point.x, max_point.y, max_point.z)) < 0.0) 
-            if out == 8:
-                return False
-        return True
+        origin_x, origin_y, origin_z = (self.key[0] * CHUNK_SIZE, self.index * SECTION_SIZE,
+                                        self.key[2] * CHUNK_SIZE)
+        return ((origin_x + int(xs.min()), origin_y + int(ys.min()), origin_z + int(zs.min())),
+                (origin_x + int(xs.max()) + 1, origin_y + int(ys.max()) + 1, origin_z + int(zs.max()) + 1))
 
     def draw(self):
-        self.update_mesh()
         self.batch.draw()
-        logging.debug(f"Drew chunk at {self.position} with {self.rendered_vertices} vertices")
 
 class GameWorld:
-    def __init__(self):
+    def __init__(self, chunk_workers=None, mesh_workers=0):
         self.chunks = {}
         self.seed = random.randint(0, 9999999)
-        self.fluid_queue = set()
-        self.load_textures()
         self.render_distance = 8  # Chunks
         self.rendered_vertices = 0
+        self.rendered_quads = 0
+        self.mesh_time = 0.0
+        self.mesh_mode = 'culled'
+        self.chunk_bounds = ChunkBounds()
+        self.storage = None  # RegionStorage for saved chunks, attached on save/load
+        self.detached_chunks = {}  # Edited chunks unloaded before any storage was attached
+        self.entities = EntityIndex()
+        self.pathfinder = PathFinder(self)
+        self.lighting = LightEngine(self, CHUNK_SIZE, CHUNK_HEIGHT, SECTION_SIZE)
+        self.fluids = FluidSimulation(self, CHUNK_SIZE, CHUNK_HEIGHT)
+        self.daylight = 1.0  # Multiplier on all world light, set by the day/night cycle
+        self.visible_sections = 0
+        self.culled_sections = 0
+        self.chunk_loader = ChunkLoader(generate_terrain, workers=chunk_workers)
+        self.chunk_budget = 0.004  # Seconds per frame spent integrating generated chunks
+        # Meshes are built inline on the GL thread unless mesh workers are requested
+        self.mesh_executor = ThreadPoolExecutor(max_workers=mesh_workers) if mesh_workers else None
         self.generate_world()
 
-    def load_textures(self):
-        self.textures = {
-            'grass': (0, 0.8, 0),  # Green
-            'dirt': (0.5, 0.25, 0),  # Brown
-            'stone': (0.5, 0.5, 0.5),  # Gray
-            'sand': (0.76, 0.7, 0.5)  # Yellow
-        }
-
     def generate_world(self):
         pass  # We'll generate chunks on-demand now
 
-    def ensure_chunks_around_player(self, player_position):
+    def ensure_chunks_around_player(self, player_position, blocking=False):
+        # Queues missing chunks for background generation and integrates finished
+        # ones within chunk_budget seconds. With blocking=True every missing chunk
+        # is generated before returning, e.g. before the player spawns.
         px, _, pz = player_position
         cx, cz = int(px) // 16, int(pz) // 16
-        for x in range(cx - self.render_distance, cx + self.render_distance + 1):
-            for z in range(cz - self.render_distance, cz + self.render_distance + 1):
-                if (x, z) not in self.chunks:
-                    self.generate_chunk(x, z)
-        
+        missing = [(x, z)
+                   for x in range(cx - self.render_distance, cx + self.render_distance + 1)
+                   for z in range(cz - self.render_distance, cz + self.render_distance + 1)
+                   if (x, z) not in self.chunks]
+        if blocking:
+            self.chunk_loader.clear()
+            for chunk_pos in missing:
+                self.load_chunk(chunk_pos)
+        elif missing:
+            # Saved chunks are read directly; only the rest go to the generator
+            start = time.perf_counter()
+            to_generate = []
+            for chunk_pos in missing:
+                if not self.is_stored(chunk_pos):
+                    to_generate.append(chunk_pos)
+                elif time.perf_counter() - start < self.chunk_budget:
+                    self.load_chunk(chunk_pos)
+            self.chunk_loader.request(to_generate, (cx, cz))
+            for chunk_pos, blocks, names in self.chunk_loader.completed(self.seed):
+                self.add_chunk(chunk_pos, blocks, names)
+                if time.perf_counter() - start >= self.chunk_budget:
+                    break
+
         # Unload distant chunks
         chunks_to_unload = []
         for chunk_pos in self.chunks:
             if max(abs(chunk_pos[0] - cx), abs(chunk_pos[1] - cz)) > self.render_distance:
                 chunks_to_unload.append(chunk_pos)
         for chunk_pos in chunks_to_unload:
-            del self.chunks[chunk_pos]
+            self.unload_chunk(chunk_pos)
 
-    def generate_chunk(self, cx, cz):
-        self.chunks[(cx, cz)] = Chunk((cx, cz), self)
-        for x in range(16):
-            for z in range(16):
-                world_x = cx * 16 + x
-                world_z = cz * 16 + z
-                self.generate_terrain(world_x, world_z)
-
-    def generate_terrain(self, world_x, world_z):
-        height = int(noise.pnoise2(world_x / 50, world_z / 50, octaves=6, persistence=0.5, lacunarity=2.0, repeatx=1024, repeaty=1024, base=self.seed) * 30 + 35)
-        logging.debug(f"Generating terrain at ({world_x}, {world_z}) with height {height}")
-        for y in range(height):
-            if y == height - 1:
-                block_type = 'grass' if noise.pnoise2(world_x / 100, world_z / 100, octaves=3, base=self.seed) > 0 else 'sand'
-            elif y > height - 4:
-                block_type = 'dirt'
+    def is_stored(self, chunk_pos):
+        return chunk_pos in self.detached_chunks or (self.storage is not None and self.storage.has_chunk(chunk_pos))
+
+    def load_chunk(self, chunk_pos):
+        # Restores a saved chunk if there is one, otherwise generates it
+        if chunk_pos in self.detached_chunks:
+            self.add_chunk(chunk_pos, *self.detached_chunks.pop(chunk_pos))
+            self.chunks[chunk_pos].modified = True
+            return
+        stored = self.storage.load_chunk(chunk_pos) if self.storage is not None else None
+        if stored is not None:
+            self.add_chunk(chunk_pos, *stored)
+        else:
+            self.generate_chunk(*chunk_pos)
+
+    def unload_chunk(self, chunk_pos):
+        # Edited chunks are written out (or kept aside until there is somewhere
+        # to write them) so their changes survive being unloaded
+        chunk = self.chunks.pop(chunk_pos)
+        for section in chunk.sections.values():
+            self.chunk_bounds.remove(section.key)
+        self.fluids.chunk_unloaded(chunk_pos)
+        if chunk.modified:
+            if self.storage is not None:
+                self.storage.save_chunk(chunk_pos, chunk.blocks, list(BLOCKS.names))
             else:
-                block_type = 'stone'
-            self.add_block((world_x, y, world_z), block_type)
+                self.detached_chunks[chunk_pos] = (chunk.blocks, list(BLOCKS.names))
+
+    def attach_storage(self, storage):
+        if self.storage is not None and self.storage is not storage:
+            self.storage.close()
+        self.storage = storage
+        # Returns how many set-aside chunks were written to the new storage
+        for chunk_pos, (blocks, names) in self.detached_chunks.items():
+            storage.save_chunk(chunk_pos, blocks, names)
+        written = len(self.detached_chunks)
+        self.detached_chunks.clear()
+        return written
+
+    def snapshot_modified_chunks(self):
+        # Copies of every chunk edited since the last save, as (chunk_pos, blocks,
+        # block names), including edited chunks set aside before any storage was
+        # attached. Clears the edited flags; later edits mark chunks again.
+        snapshot = [(chunk_pos, blocks, list(names))
+                    for chunk_pos, (blocks, names) in self.detached_chunks.items()]
+        self.detached_chunks.clear()
+        for chunk_pos, chunk in self.chunks.items():
+            if chunk.modified:
+                snapshot.append((chunk_pos, chunk.blocks, list(BLOCKS.names)))
+                chunk.modified = False
+        return snapshot
+
+    def generate_chunk(self, cx, cz):
+        with PROFILER.timer('chunk generation'):
+            generated = generate_terrain(self.seed, cx, cz)
+        self.add_chunk((cx, cz), *generated)
+
+    def add_chunk(self, chunk_pos, blocks, names):
+        with PROFILER.timer('chunk setup'):
+            chunk = Chunk(chunk_pos, self)
+            chunk.set_blocks(blocks, names)
+            self.chunks[chunk_pos] = chunk
+            for section in chunk.sections.values():
+                self.chunk_bounds.set(section.key, section.calculate_bounding_box())
+            self.lighting.light_chunk(chunk)
+            self.fluids.chunk_loaded(chunk)
+            self.mark_neighbours_dirty(chunk)
+        PROFILER.count('chunks loaded')
 
     def add_block(self, position, block_type):
+        # Returns whether the block was placed: the spot must be empty and
+        # block_type a registered block rather than an item
+        if not self.place_block(position, block_type):
+            return False
+        with PROFILER.timer('light updates'):
+            self.lighting.blocks_changed([(position, AIR)])
+        self.fluids.block_changed(position)
+        if BLOCKS.solid.item(BLOCKS.ids[block_type]):
+            self.pathfinder.invalidate([position])
+        return True
+
+    def remove_block(self, position):
+        removed_type = self.clear_block(position)
+        if removed_type is not None:
+            with PROFILER.timer('light updates'):
+                self.lighting.blocks_changed([(position, BLOCKS.ids[removed_type])])
+            self.fluids.block_changed(position)
+            if BLOCKS.solid.item(BLOCKS.ids[removed_type]):
+                self.pathfinder.invalidate([position])
+        return removed_type
+
+    def replace_blocks(self, changes):
+        # Applies {position: block_type, or None for air} edits in one go,
+        # sharing a single light update and path invalidation; the fluid
+        # simulation's edits
+        lit = []
+        walkable_changed = []  # Where mobs can stand may differ
+        for position, block_type in changes.items():
+            old_id = self.get_block_id(position)
+            if old_id:
+                self.clear_block(position)
+            if block_type is not None:
+                self.place_block(position, block_type)
+            lit.append((position, old_id))
+            if BLOCKS.solid.item(old_id) != BLOCKS.solid.item(self.get_block_id(position)):
+                walkable_changed.append(position)
+        with PROFILER.timer('light updates'):
+            self.lighting.blocks_changed(lit)
+        if walkable_changed:
+            self.pathfinder.invalidate(walkable_changed)
+
+    def place_block(self, position, block_type):
+        # add_block without updating light, fluids or paths
         chunk_pos = (position[0] // 16, position[2] // 16)
         if chunk_pos not in self.chunks:
             self.chunks[chunk_pos] = Chunk(chunk_pos, self)
-        self.chunks[chunk_pos].add_block(position, block_type)
+        section = self.chunks[chunk_pos].add_block(position, block_type)
+        if section is None:
+            return False
+        self.chunk_bounds.include(section.key, position)
+        self.mark_border_dirty(position)
+        return True
 
-    def remove_block(self, position):
+    def clear_block(self, position):
+        # remove_block without updating light, fluids or paths
         chunk_pos = (position[0] // 16, position[2] // 16)
         if chunk_pos in self.chunks:
-            return self.chunks[chunk_pos].remove_block(position)
+            chunk = self.chunks[chunk_pos]
+            removed_type = chunk.remove_block(position)
+            if removed_type is not None:
+                index = position[1] // SECTION_SIZE
+                if index not in chunk.sections:
+                    self.chunk_bounds.remove((chunk_pos[0], index, chunk_pos[1]))  # Now all air
+                self.mark_border_dirty(position)
+            return removed_type
         return None
 
+    def mark_border_dirty(self, position):
+        # An edit on a section face changes which faces the section across it
+        # must draw
+        x, y, z = position
+        neighbours = []
+        for axis, low, high in ((0, (x - 1, y, z), (x + 1, y, z)),
+                                (1, (x, y - 1, z), (x, y + 1, z)),
+                                (2, (x, y, z - 1), (x, y, z + 1))):
+            local = position[axis] % SECTION_SIZE
+            if local == 0:
+                neighbours.append(low)
+            elif local == SECTION_SIZE - 1:
+                neighbours.append(high)
+        for nx, ny, nz in neighbours:
+            chunk = self.chunks.get((nx // CHUNK_SIZE, nz // CHUNK_SIZE))
+            section = chunk.sections.get(ny // SECTION_SIZE) if chunk is not None else None
+            if section is not None:
+                section.needs_update = True
+
+    def mark_neighbours_dirty(self, chunk):
+        # A newly loaded chunk hides faces of the sections beside its own
+        cx, cz = chunk.position
+        for chunk_pos in ((cx - 1, cz), (cx + 1, cz), (cx, cz - 1), (cx, cz + 1)):
+            neighbour = self.chunks.get(chunk_pos)
+            if neighbour is None:
+                continue
+            for index in chunk.sections:
+                section = neighbour.sections.get(index)
+                if section is not None:
+                    section.needs_update = True
+
+    def set_mesh_mode(self, mode):
+        if mode not in MESH_MODES:
+            raise ValueError(f"Unknown mesh mode: {mode}")
+        self.mesh_mode = mode
+        for chunk in self.chunks.values():
+            for section in chunk.sections.values():
+                section.needs_update = True
+
     def get_block(self, position):
-        chunk_pos = (position[0] // 16, position[2] // 16)
-        if chunk_pos in self.chunks:
-            return self.chunks[chunk_pos].get_block(position)
-        return None
+        return BLOCKS.names[self.get_block_id(position)]
+
+    def get_block_id(self, position):
+        # Id in the BLOCKS registry of the block at position, 0 for air or an
+        # unloaded chunk
+        chunk = self.chunks.get((position[0] // 16, position[2] // 16))
+        if chunk is None:
+            return AIR
+        return chunk.get_block_id(position)
 
     def get_height(self, x, z):
-        for y in range(255, -1, -1):
-            if self.get_block((int(x), y, int(z))) is not None:
-                return y
-        return 0
+        # y of the highest solid block in the column containing (x, z), or 0
+        # if there is none or its chunk is not loaded
+        x, z = math.floor(x), math.floor(z)
+        chunk = self.chunks.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+        if chunk is None:
+            return 0
+        return max(0, int(chunk.heightmap[x % CHUNK_SIZE, z % CHUNK_SIZE]))
+
+    def chunk_keys(self, columns):
+        # Groups integer (x, z) columns by chunk, packing chunk coordinates into
+        # one integer key per row so the grouping is cheap. Returns the chunk
+        # positions touched and, per row, the index of its chunk among them.
+        chunk_coords = columns // CHUNK_SIZE + (1 << 20)
+        keys, inverse = np.unique(chunk_coords[:, 0] << 21 | chunk_coords[:, 1], return_inverse=True)
+        chunk_positions = zip(((keys >> 21) - (1 << 20)).tolist(), ((keys & ((1 << 21) - 1)) - (1 << 20)).tolist())
+        return list(chunk_positions), inverse.reshape(-1)
+
+    def get_heights(self, columns):
+        # Batched get_height for an (N, 2) array-like of (x, z) columns
+        columns = np.floor(np.asarray(columns, dtype=np.float64).reshape(-1, 2)).astype(np.int64)
+        if not len(columns):
+            return np.zeros(0, dtype=np.int64)
+        local = columns % CHUNK_SIZE
+        chunk_positions, inverse = self.chunk_keys(columns)
+        # Stack the heightmaps of every chunk touched, then gather in one step
+        missing = np.full((CHUNK_SIZE, CHUNK_SIZE), -1, dtype=np.int16)
+        heightmaps = np.stack([self.chunks[chunk_pos].heightmap if chunk_pos in self.chunks else missing
+                               for chunk_pos in chunk_positions])
+        heights = heightmaps[inverse, local[:, 0], local[:, 1]].astype(np.int64)
+        return np.maximum(heights, 0)
+
+    def occupied(self, voxels, solid=False):
+        # Batched block test for an (N, 3) array of integer voxels: is there any
+        # block there, or with solid=True, one that entities collide with
+        voxels = np.asarray(voxels, dtype=np.int64).reshape(-1, 3)
+        result = np.zeros(len(voxels), dtype=bool)
+        in_world = np.flatnonzero((voxels[:, 1] >= 0) & (voxels[:, 1] < CHUNK_HEIGHT))
+        if not len(in_world):
+            return result
+        voxels = voxels[in_world]
+        chunk_positions, inverse = self.chunk_keys(voxels[:, [0, 2]])
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(chunk_positions) + 1))
+        for i, chunk_pos in enumerate(chunk_positions):
+            chunk = self.chunks.get(chunk_pos)
+            if chunk is None:
+                continue
+            rows = order[bounds[i]:bounds[i + 1]]
+            x, y, z = voxels[rows].T
+            block_ids = chunk.block_ids(x % CHUNK_SIZE, y, z % CHUNK_SIZE)
+            result[in_world[rows]] = BLOCKS.solid[block_ids] if solid else block_ids != 0
+        return result
+
+    def raycast(self, origin, direction, max_distance=8):
+        # First block along the ray as a physics.RaycastHit, or None
+        return physics.raycast(self, origin, direction, max_distance)
+
+    def raycast_many(self, origins, directions, max_distance=8):
+        # Casts N rays at once; see physics.raycast_many for the returned arrays
+        return physics.raycast_many(self, origins, directions, max_distance)
 
     def draw(self):
         gl.glEnable(gl.GL_DEPTH_TEST)
         gl.glEnable(gl.GL_CULL_FACE)
         gl.glCullFace(gl.GL_BACK)
         gl.glFrontFace(gl.GL_CCW)
+        # Light is baked into vertex colours; the time of day scales them all
+        # at once through the ambient light model, with no lights enabled
+        gl.glEnable(gl.GL_LIGHTING)
+        gl.glEnable(gl.GL_COLOR_MATERIAL)
+        gl.glColorMaterial(gl.GL_FRONT_AND_BACK, gl.GL_AMBIENT_AND_DIFFUSE)
+        gl.glLightModelfv(gl.GL_LIGHT_MODEL_AMBIENT, (gl.GLfloat * 4)(self.daylight, self.daylight, self.daylight, 1))
+        get_atlas().bind()
         
-        frustum = self.calculate_frustum()
-        logging.debug(f"Drawing {len(self.chunks)} chunks")
+        # Culled and drawn per section; all-air sections have no bounds at all
+        with PROFILER.timer('culling'):
+            visible = self.chunk_bounds.visible(self.calculate_frustum())
+        self.visible_sections = len(visible)
+        self.culled_sections = len(self.chunk_bounds) - len(visible)
         self.rendered_vertices = 0
-        for chunk in self.chunks.values():
-            if chunk.is_visible(frustum):
-                gl.glPushMatrix()
-                gl.glTranslatef(chunk.position[0] * 16, 0, chunk.position[1] * 16)
-                chunk.draw()
-                self.rendered_vertices += chunk.rendered_vertices
-                gl.glPopMatrix()
+        self.rendered_quads = 0
+        self.mesh_time = 0.0
+        for cx, index, cz in visible:
+            section = self.chunks[(cx, cz)].sections[index]
+            self.update_section_mesh(section)
+            gl.glPushMatrix()
+            gl.glTranslatef(cx * CHUNK_SIZE, index * SECTION_SIZE, cz * CHUNK_SIZE)
+            section.draw()
+            self.rendered_vertices += section.rendered_vertices
+            self.rendered_quads += section.quad_count
+            gl.glPopMatrix()
+        get_atlas().unbind()
+        gl.glDisable(gl.GL_COLOR_MATERIAL)
+        gl.glDisable(gl.GL_LIGHTING)
+
+    def update_section_mesh(self, section):
+        # Uploads a mesh finished by a worker, or (re)builds a dirty one. A
+        # section edited while its mesh is in flight keeps needs_update set and
+        # is rebuilt once the stale mesh has been uploaded.
+        if section.mesh_future is not None:
+            if not section.mesh_future.done():
+                return
+            needs_update = section.needs_update
+            section.upload_mesh(section.mesh_future.result())
+            section.needs_update = needs_update
+            section.mesh_future = None
+            self.mesh_time += section.mesh_time
+        if not section.needs_update:
+            return
+        if self.mesh_executor is None:
+            section.update_mesh()
+            self.mesh_time += section.mesh_time
+        else:
+            section.needs_update = False
+            section.mesh_future = self.mesh_executor.submit(build_mesh, *section.mesh_input())
 
     def calculate_frustum(self):
         proj = (gl.GLfloat * 16)()
         gl.glGetFloatv(gl.GL_PROJECTION_MATRIX, proj)
         modl = (gl.GLfloat * 16)()
         gl.glGetFloatv(gl.GL_MODELVIEW_MATRIX, modl)
-        
-        clip = [0] * 16
-        for i in range(4):
-            for j in range(4):
-                clip[i * 4 + j] = sum(proj[i + k * 4] * modl[k * 4 + j] for k in range(4))
-        
-        frustum = []
-        for i in range(6):
-            plane = Vec3(clip[3, 0] - clip[i // 2, 0],
-                         clip[3, 1] - clip[i // 2, 1],
-                         clip[3, 2] - clip[i // 2, 2])
-            d = clip[3, 3] - clip[i // 2, 3]
-            magnitude = plane.mag()
-            frustum.append(Vec3(plane.x / magnitude, plane.y / magnitude, plane.z / magnitude))
-        return frustum
+        return frustum_planes(proj, modl)
 
     def update_fluids(self):
-        # Simplified fluid update (no actual simulation)
-        pass
+        # One simulation tick of flowing water and lava
+        with PROFILER.timer('fluids'):
+            self.fluids.update()
 
-    def collide(self, position):
-        x, y, z = position
-        for dx in range(-1, 2):
-            for dy in range(-2, 3):
-                for dz in range(-1, 2):
-                    if self.get_block((int(x + dx), int(y + dy), int(z + dz))):
-                        return True
-        return False
+    def is_solid(self, position):
+        return BLOCKS.solid.item(self.get_block_id(position))
+
+    def collide(self, position, width=0.6, height=1.8):
+        # Does an entity box with its feet at position overlap a solid block?
+        return physics.overlaps(self, position, width, height)
 
     def regenerate(self):
+        self.chunk_loader.clear()
         self.chunks.clear()
-        self.fluid_queue.clear()
+        self.chunk_bounds.clear()
+        self.detached_chunks.clear()
+        self.entities.clear()
+        self.pathfinder.clear()
+        self.fluids.clear()
         self.generate_world()
+
+    def shutdown(self):
+        self.chunk_loader.shutdown()
+        if self.storage is not None:
+            self.storage.close()
+        if self.mesh_executor is not None:
+            self.mesh_executor.shutdown(wait=False, cancel_futures=True)
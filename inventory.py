@@ -1,36 +1,17 @@
 import pyglet
-from pyglet import resource
 from pyglet import graphics
-import logging
+from atlas import get_atlas
 
-logging.basicConfig(level=logging.INFO)
-import os
 
 class Inventory:
     def __init__(self):
         self.slots = [None] * 36  # 36 inventory slots
         self.hotbar_slots = 9  # First 9 slots are the hotbar
         self.selected_slot = 0
-        
-        # Texture loading
-        resource.path = [os.path.join(os.path.dirname(__file__), 'textures')]
-        resource.reindex()
-        self.textures = {}
-        texture_names = [
-            'grass', 'dirt', 'stone', 'wood', 'leaves', 'sand', 'water', 'coal_ore', 'iron_ore', 'gold_ore', 'diamond_ore',
-            'wooden_planks', 'stick', 'wooden_pickaxe', 'stone_pickaxe', 'iron_pickaxe', 'furnace', 'coal', 'iron_ingot',
-            'gold_ingot', 'diamond'
-        ]
-        for name in texture_names:
-            try:
-                texture = resource.image(f'{name}.png')
-                if texture:
-                    self.textures[name] = texture.get_texture()
-                    logging.info(f"Successfully loaded texture in inventory: {name}")
-                else:
-                    logging.warning(f"Failed to load texture in inventory: {name}")
-            except Exception as e:
-                logging.error(f"Error loading texture in inventory {name}: {e}")
+        # Stack counts of the hotbar and of the full inventory: one label per
+        # slot in a batch, created on first draw and only laid out again when
+        # what its slot shows changes
+        self.count_labels = {}  # View -> (Batch, {slot: Label}, {slot: (text, x, y)})
 
     def add_item(self, item, amount=1):
         try:
@@ -77,6 +58,9 @@ class Inventory:
 
     def draw(self, window):
         # Draw hotbar
+        atlas = get_atlas()
+        icons = []
+        positions = {}
         for i in range(self.hotbar_slots):
             x = 10 + i * 40
             y = 10
@@ -90,19 +74,16 @@ class Inventory:
                     ('c3f', (1, 1, 1) * 4)
                 )
             if self.slots[i]:
-                item, count = self.slots[i]
-                if item in self.textures:
-                    self.textures[item].blit(x+4, y+4, width=32, height=32)
-                else:
-                    # Fallback rendering
-                    graphics.draw(4, pyglet.gl.GL_QUADS,
-                        ('v2f', (x+4, y+4, x+36, y+4, x+36, y+36, x+4, y+36)),
-                        ('c3f', (0.8, 0.8, 0.8) * 4)
-                    )
-                pyglet.text.Label(str(count), x=x+34, y=y+2, color=(255, 255, 255, 255)).draw()
+                self.add_icon(atlas, icons, self.slots[i], x, y)
+            positions[i] = (x, y)
+        atlas.draw_icons(icons)
+        self.draw_counts('hotbar', positions)
 
     def draw_full_inventory(self, window):
         # Draw full inventory
+        atlas = get_atlas()
+        icons = []
+        positions = {}
         for i, slot in enumerate(self.slots):
             x = 10 + (i % 9) * 40
             y = window.height - 50 - (i // 9) * 40
@@ -111,16 +92,38 @@ class Inventory:
                 ('c3f', (0.5, 0.5, 0.5) * 4)
             )
             if slot:
-                item, count = slot
-                if item in self.textures:
-                    self.textures[item].blit(x+4, y+4, width=32, height=32)
-                else:
-                    # Fallback rendering
-                    graphics.draw(4, pyglet.gl.GL_QUADS,
-                        ('v2f', (x+4, y+4, x+36, y+4, x+36, y+36, x+4, y+36)),
-                        ('c3f', (0.8, 0.8, 0.8) * 4)
-                    )
-                pyglet.text.Label(str(count), x=x+34, y=y+2, color=(255, 255, 255, 255)).draw()
+                self.add_icon(atlas, icons, slot, x, y)
+            positions[i] = (x, y)
+        atlas.draw_icons(icons)
+        self.draw_counts('full', positions)
+
+    def add_icon(self, atlas, icons, slot, x, y):
+        # Every item icon comes from the one atlas texture, drawn in one call
+        item = slot[0]
+        if item in atlas.tiles:
+            icons.append((item, x+4, y+4, 32))
+        else:
+            # Fallback rendering
+            graphics.draw(4, pyglet.gl.GL_QUADS,
+                ('v2f', (x+4, y+4, x+36, y+4, x+36, y+36, x+4, y+36)),
+                ('c3f', (0.8, 0.8, 0.8) * 4)
+            )
+
+    def draw_counts(self, view, positions):
+        # positions: {slot: (x, y)} of every slot the view draws
+        if view not in self.count_labels:
+            batch = graphics.Batch()
+            labels = {i: pyglet.text.Label('', color=(255, 255, 255, 255), batch=batch) for i in positions}
+            self.count_labels[view] = (batch, labels, {})
+        batch, labels, shown = self.count_labels[view]
+        for i, (x, y) in positions.items():
+            slot = self.slots[i]
+            state = (str(slot[1]) if slot else '', x + 34, y + 2)
+            if shown.get(i) != state:
+                shown[i] = state
+                labels[i].text = state[0]
+                labels[i].position = state[1:]
+        batch.draw()
 
     def handle_click(self, x, y, button, modifiers):
         # Handle clicks in the inventory
@@ -0,0 +1,263 @@
+from collections import deque
+import numpy as np
+from blocks import BLOCKS
+
+# Per-voxel light in two channels, packed into one byte per voxel of
+# Chunk.light: skylight in the high nibble, light from glowing blocks (torches,
+# lava) in the low one. Skylight is 15 straight down from the open sky and both
+# lose a level per step sideways, so neither gets through opaque blocks.
+MAX_LIGHT = 15
+SKY = 4  # Shift of each channel within the packed byte
+BLOCK = 0
+# Brightness drawn for each light level, never quite black
+LIGHT_CURVE = (0.08 + 0.92 * 0.8 ** np.arange(MAX_LIGHT, -1, -1)).astype(np.float32)
+NEIGHBOURS = ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+
+def combined(light):
+    # Brightest channel of packed light values
+    return np.maximum(light >> SKY, light & MAX_LIGHT)
+
+def spread(levels, transparent, sky=False):
+    # Floods light within one chunk by whole-array passes, each letting it
+    # step one voxel further, until nothing changes. Skylight at full level
+    # falls straight down without losing a level.
+    levels = levels.astype(np.int16)
+    for _ in range(MAX_LIGHT):
+        brightest = np.zeros_like(levels)
+        np.maximum(brightest[1:], levels[:-1], out=brightest[1:])
+        np.maximum(brightest[:-1], levels[1:], out=brightest[:-1])
+        np.maximum(brightest[:, :-1], levels[:, 1:], out=brightest[:, :-1])
+        np.maximum(brightest[:, 1:], levels[:, :-1], out=brightest[:, 1:])
+        np.maximum(brightest[:, :, 1:], levels[:, :, :-1], out=brightest[:, :, 1:])
+        np.maximum(brightest[:, :, :-1], levels[:, :, 1:], out=brightest[:, :, :-1])
+        brightest -= 1
+        if sky:
+            falling = np.zeros_like(levels)
+            falling[:, :-1] = np.where(levels[:, 1:] == MAX_LIGHT, MAX_LIGHT, 0)
+            np.maximum(brightest, falling, out=brightest)
+        lit = np.where(transparent, np.maximum(levels, brightest), levels)
+        if (lit == levels).all():
+            break
+        levels = lit
+    return levels.astype(np.uint8)
+
+class LightEngine:
+    # Keeps Chunk.light up to date. A newly loaded chunk is lit in bulk and
+    # then flooded across its borders; an edit only floods outwards from the
+    # changed voxel: a breadth-first fill for light added, and for light
+    # removed a fill that darkens everything the old light reached and
+    # relights it from whatever brighter light borders the darkened region.
+    # Sections whose faces are lit by a changed voxel are marked for a remesh.
+    def __init__(self, world, chunk_size, chunk_height, section_size):
+        self.world = world
+        self.chunk_size = chunk_size
+        self.chunk_height = chunk_height
+        self.section_size = section_size
+        self.changed = []  # Voxels whose light changed in the current update
+
+    def light_chunk(self, chunk):
+        # Properties are looked up once per stored section rather than per voxel
+        transparent = self.dense(chunk, ~BLOCKS.opaque[chunk.section_data])
+        # Skylight reaches down each column to its first opaque block
+        sky = np.logical_and.accumulate(transparent[:, ::-1], axis=1)[:, ::-1].astype(np.uint8) * MAX_LIGHT
+        if (transparent & (sky == 0)).any():
+            sky = spread(sky, transparent, sky=True)  # Overhangs and caves
+        emitted = BLOCKS.light[chunk.section_data]
+        block = self.dense(chunk, emitted) if emitted.any() else np.zeros_like(sky)
+        if block.any():
+            block = spread(block, transparent)
+        chunk.set_light((sky << SKY | block).astype(np.uint8))
+        self.light_borders(chunk)
+
+    def dense(self, chunk, per_slot):
+        # Expands [slot, x, y, z] values of a chunk's stored sections to its
+        # whole [x, y, z] column
+        sections = per_slot[chunk.section_slots]
+        return sections.transpose(1, 0, 2, 3).reshape(self.chunk_size, self.chunk_height, self.chunk_size)
+
+    def light_borders(self, chunk):
+        # Floods light across the faces between the chunk and its loaded
+        # neighbours, both ways, seeded only where one side is brighter
+        size = self.chunk_size
+        cx, cz = chunk.position
+        seeds = {SKY: [], BLOCK: []}
+        for neighbour_pos, edge, neighbour_edge in (((cx - 1, cz), 0, size - 1), ((cx + 1, cz), size - 1, 0),
+                                                    ((cx, cz - 1), 0, size - 1), ((cx, cz + 1), size - 1, 0)):
+            neighbour = self.world.chunks.get(neighbour_pos)
+            if neighbour is None:
+                continue
+            facing_x = neighbour_pos[1] == cz  # The shared face is across x
+            sides = ((chunk, edge) + self.face(chunk, edge, facing_x),
+                     (neighbour, neighbour_edge) + self.face(neighbour, neighbour_edge, facing_x))
+            for (source, source_edge, source_levels, _), (_, _, target_levels, target_transparent) in (sides, sides[::-1]):
+                origin_x, origin_z = source.position[0] * size, source.position[1] * size
+                channels, ys, offsets = np.nonzero(target_transparent & (source_levels - 1 > target_levels))
+                for channel, y, offset in zip(channels.tolist(), ys.tolist(), offsets.tolist()):
+                    if facing_x:
+                        seeds[(SKY, BLOCK)[channel]].append((origin_x + source_edge, y, origin_z + offset))
+                    else:
+                        seeds[(SKY, BLOCK)[channel]].append((origin_x + offset, y, origin_z + source_edge))
+        self.changed = []
+        for shift, queue in seeds.items():
+            if queue:
+                self.propagate(deque(queue), shift)
+        self.mark_changed()
+
+    def face(self, chunk, edge, facing_x):
+        # Skylight and block light levels of one side face of a chunk, stacked
+        # as [channel, y, offset along the face], and its transparency as
+        # [y, offset along the face]
+        shape = (self.chunk_height, self.chunk_size)
+        if facing_x:
+            light = chunk.light_data[chunk.light_slots, edge].reshape(shape)
+            block_ids = chunk.section_data[chunk.section_slots, edge].reshape(shape)
+        else:
+            light = chunk.light_data[chunk.light_slots, :, :, edge].transpose(0, 2, 1).reshape(shape)
+            block_ids = chunk.section_data[chunk.section_slots, :, :, edge].transpose(0, 2, 1).reshape(shape)
+        levels = np.stack([light >> SKY, light & MAX_LIGHT]).astype(np.int16)
+        return levels, ~BLOCKS.opaque[block_ids]
+
+    def level(self, x, y, z, shift):
+        # Light level of one channel at a voxel, or None outside loaded chunks
+        if not 0 <= y < self.chunk_height:
+            return None
+        chunk = self.world.chunks.get((x // self.chunk_size, z // self.chunk_size))
+        if chunk is None:
+            return None
+        return chunk.light_value(x % self.chunk_size, y, z % self.chunk_size) >> shift & MAX_LIGHT
+
+    def set_level(self, x, y, z, shift, level):
+        chunk = self.world.chunks[(x // self.chunk_size, z // self.chunk_size)]
+        local_x, local_z = x % self.chunk_size, z % self.chunk_size
+        value = chunk.light_value(local_x, y, local_z) & ~(MAX_LIGHT << shift) | level << shift
+        chunk.set_light_value(local_x, y, local_z, value)
+        self.changed.append((x, y, z))
+
+    def get_light(self, position):
+        # (skylight, block light) at an integer voxel; full daylight outside
+        # loaded chunks
+        x, y, z = position
+        sky = self.level(x, y, z, SKY)
+        if sky is None:
+            return MAX_LIGHT, 0
+        return sky, self.level(x, y, z, BLOCK)
+
+    def passes_light(self, x, y, z):
+        return not BLOCKS.opaque.item(self.world.get_block_id((x, y, z)))
+
+    def propagate(self, queue, shift):
+        # Breadth-first fill outwards from the voxels queued, each lighting
+        # its neighbours to one level below its own
+        while queue:
+            x, y, z = queue.popleft()
+            level = self.level(x, y, z, shift)
+            for dx, dy, dz in NEIGHBOURS:
+                nx, ny, nz = x + dx, y + dy, z + dz
+                neighbour_level = self.level(nx, ny, nz, shift)
+                if neighbour_level is None:
+                    continue
+                lit = level if shift == SKY and dy == -1 and level == MAX_LIGHT else level - 1
+                if neighbour_level < lit and self.passes_light(nx, ny, nz):
+                    self.set_level(nx, ny, nz, shift, lit)
+                    queue.append((nx, ny, nz))
+
+    def unpropagate(self, queue, shift):
+        # Darkens everything lit by the (voxel, old level) entries queued,
+        # which must already be dark, then relights the darkened region from
+        # the brighter light found around its edge
+        relight = deque()
+        while queue:
+            x, y, z, level = queue.popleft()
+            for dx, dy, dz in NEIGHBOURS:
+                nx, ny, nz = x + dx, y + dy, z + dz
+                neighbour_level = self.level(nx, ny, nz, shift)
+                if not neighbour_level:
+                    continue
+                if neighbour_level < level or (shift == SKY and dy == -1 and level == neighbour_level == MAX_LIGHT):
+                    self.set_level(nx, ny, nz, shift, 0)
+                    queue.append((nx, ny, nz, neighbour_level))
+                    if shift == BLOCK:
+                        emitted = BLOCKS.light.item(self.world.get_block_id((nx, ny, nz)))
+                        if emitted:
+                            self.set_level(nx, ny, nz, shift, emitted)  # A light source of its own
+                            relight.append((nx, ny, nz))
+                else:
+                    relight.append((nx, ny, nz))
+        self.propagate(relight, shift)
+
+    def blocks_changed(self, changes):
+        # Call after blocks were placed or removed, with (position, id of the
+        # block that was there before) for each; many edits share one fill
+        self.changed = []
+        for shift in (SKY, BLOCK):
+            # Light at an edited voxel can no longer be trusted where the
+            # voxel now blocks light, or where the block that was there may
+            # have been where that light came from. Either way not when the
+            # new block gives off at least as much as was there.
+            darkened = deque()
+            for position, old_id in changes:
+                x, y, z = position
+                level = self.level(x, y, z, shift)
+                block_id = self.world.get_block_id(position)
+                if not level or (shift == BLOCK and BLOCKS.light.item(block_id) >= level):
+                    continue
+                if BLOCKS.opaque.item(block_id) or (shift == BLOCK and BLOCKS.light.item(old_id) >= level):
+                    self.set_level(x, y, z, shift, 0)
+                    darkened.append((x, y, z, level))
+            self.unpropagate(darkened, shift)
+            # Then light flows in from around each edit, or out of a new source
+            sources = deque()
+            for position, _ in changes:
+                x, y, z = position
+                block_id = self.world.get_block_id(position)
+                if shift == BLOCK and BLOCKS.light.item(block_id) > self.level(x, y, z, BLOCK):
+                    self.set_level(x, y, z, BLOCK, BLOCKS.light.item(block_id))
+                    sources.append((x, y, z))
+                if BLOCKS.opaque.item(block_id):
+                    continue
+                if shift == SKY and y == self.chunk_height - 1 and self.level(x, y, z, SKY) < MAX_LIGHT:
+                    self.set_level(x, y, z, SKY, MAX_LIGHT)  # Open to the sky
+                    sources.append((x, y, z))
+                sources.extend((x + dx, y + dy, z + dz) for dx, dy, dz in NEIGHBOURS
+                               if self.level(x + dx, y + dy, z + dz, shift))
+            self.propagate(sources, shift)
+        self.mark_changed()
+
+    def mark_changed(self):
+        # Marks for a remesh every section holding a changed voxel or a block
+        # whose faces it lights
+        if not self.changed:
+            return
+        voxels = np.array(self.changed)
+        voxels = (voxels[:, None, :] + np.array(((0, 0, 0),) + NEIGHBOURS)[None]).reshape(-1, 3)
+        voxels = voxels[(voxels[:, 1] >= 0) & (voxels[:, 1] < self.chunk_height)]
+        keys = np.unique(np.stack([voxels[:, 0] // self.chunk_size, voxels[:, 1] // self.section_size,
+                                   voxels[:, 2] // self.chunk_size], axis=1), axis=0)
+        for cx, index, cz in keys.tolist():
+            chunk = self.world.chunks.get((cx, cz))
+            section = chunk.sections.get(index) if chunk is not None else None
+            if section is not None:
+                section.needs_update = True
+        self.changed = []
+
+    def section_levels(self, chunk, index):
+        # Brightest light level of every voxel in and around one section, as
+        # the (x, y, z) padded array build_mesh takes. Voxels above the world
+        # or in unloaded chunks count as open sky.
+        size, height = self.chunk_size, self.section_size
+        base = index * height
+        levels = np.full((size + 2, height + 2, size + 2), MAX_LIGHT, dtype=np.uint8)
+        low, high = max(base - 1, 0), min(base + height + 1, self.chunk_height)
+        ys = slice(low - base + 1, high - base + 1)
+        levels[1:-1, ys, 1:-1] = combined(chunk.light_range(low, high))
+        if base == 0:
+            levels[:, 0] = 0  # Below the world
+        cx, cz = chunk.position
+        for neighbour_pos, target, source in (((cx - 1, cz), (0, ys, slice(1, -1)), (-1,)),
+                                              ((cx + 1, cz), (-1, ys, slice(1, -1)), (0,)),
+                                              ((cx, cz - 1), (slice(1, -1), ys, 0), (slice(None), slice(None), -1)),
+                                              ((cx, cz + 1), (slice(1, -1), ys, -1), (slice(None), slice(None), 0))):
+            neighbour = self.world.chunks.get(neighbour_pos)
+            if neighbour is not None:
+                levels[target] = combined(neighbour.light_range(low, high)[source])
+        return levels
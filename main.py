@@ -8,16 +8,20 @@ from pyglet.graphics import Batch
 from pyglet.text import Label
 import traceback
 import sys
+import logging
+import physics
 
 pyglet.options['shadow_window'] = False
 
-from game_world import GameWorld
+from game_world import GameWorld, MESH_MODES
 from player import Player
 from inventory import Inventory
 from gui import GUI
-from mobs import Sheep, Zombie
-from save_load import SaveLoadManager
+from mobs import MobManager, Sheep, Zombie
+from save_load import SaveLoadManager, AutoSave
 from weather import WeatherSystem
+from timestep import FixedTimestep
+from profiler import PROFILER
 
 class Game(pyglet.window.Window):
     def __init__(self, *args, **kwargs):
@@ -39,17 +43,25 @@ class Game(pyglet.window.Window):
         self.set_exclusive_mouse(self.exclusive)
         self.world = GameWorld()
         self.player = Player(Vec3(0.5, 150.0, 0.5))  # Increased Y value
-        self.player.position[1] = self.world.get_height(self.player.position[0], self.player.position[2]) + 2
+        self.world.ensure_chunks_around_player(self.player.position, blocking=True)
+        x, y, z = self.player.position
+        self.player.teleport([x, self.world.get_height(x, z) + 2, z])
         print(f"Player initial position: {self.player.get_position()}")
         self.gui = GUI(self)
-        self.mobs = []
+        self.mobs = MobManager(self.world)
         self.weather_system = WeatherSystem(self)
+        self.auto_save = AutoSave(self)
+        # The simulation runs in fixed ticks of update(); frames only render
+        self.timestep = FixedTimestep(self.update)
         self.time_of_day = 0  # 0 to 1, where 0 is dawn and 0.5 is dusk
         self.ambient_light = 0.5
 
         self.batch = Batch()
         self.fps_display = pyglet.window.FPSDisplay(self)
         self.info_label = Label('', x=10, y=self.height - 10, batch=self.batch)
+        # Subsystem timings, shown and recorded only while profiling (F3)
+        self.profiler_label = Label('', font_name='Courier New', font_size=9, multiline=True, width=420,
+                                    anchor_x='right', anchor_y='top', x=self.width - 10, y=self.height - 10)
 
         self.spawn_mobs()
 
@@ -60,17 +72,25 @@ class Game(pyglet.window.Window):
         gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
 
     def spawn_mobs(self):
-        for _ in range(20):  # Spawn 20 sheep
-            x = random.uniform(-64, 64)
-            z = random.uniform(-64, 64)
-            y = self.world.get_height(x, z) + 1
-            self.mobs.append(Sheep((x, y, z)))
-        
-        for _ in range(10):  # Spawn 10 zombies
-            x = random.uniform(-64, 64)
-            z = random.uniform(-64, 64)
-            y = self.world.get_height(x, z) + 1
-            self.mobs.append(Zombie((x, y, z)))
+        sheep = [(random.uniform(-64, 64), random.uniform(-64, 64)) for _ in range(20)]  # Spawn 20 sheep
+        zombies = [(random.uniform(-64, 64), random.uniform(-64, 64)) for _ in range(10)]  # Spawn 10 zombies
+        heights = self.world.get_heights(sheep + zombies) + 1
+        self.world.entities.update(self.player)
+        for (x, z), y in zip(sheep, heights[:len(sheep)].tolist()):
+            self.spawn_mob(Sheep((x, y, z)))
+        for (x, z), y in zip(zombies, heights[len(sheep):].tolist()):
+            self.spawn_mob(Zombie((x, y, z)))
+
+    def spawn_mob(self, mob):
+        # Skips spots where the mob would overlap another entity, and keeps
+        # zombies from spawning right next to the player
+        entities = self.world.entities
+        if entities.query_aabb(*physics.entity_box(mob.position, mob.width, mob.height)):
+            return False
+        if isinstance(mob, Zombie) and entities.nearest(mob.position, Player, 16):
+            return False
+        self.mobs.add(mob)
+        return True
 
     def on_mouse_press(self, x, y, button, modifiers):
         if self.exclusive:
@@ -91,34 +111,52 @@ class Game(pyglet.window.Window):
             self.player.inventory.select_slot(symbol - key._1)
         elif symbol == key.E:
             self.player.toggle_inventory()
+        elif symbol == key.F3:
+            PROFILER.enabled = not PROFILER.enabled
+            self.update_profiler_overlay()
+        elif symbol == key.F4:
+            self.dump_profile()
         elif symbol == key.F5:
             self.save_game()
         elif symbol == key.F9:
             self.load_game()
+        elif symbol == key.M:
+            modes = MESH_MODES
+            self.world.set_mesh_mode(modes[(modes.index(self.world.mesh_mode) + 1) % len(modes)])
 
     def update(self, dt):
-        self.player.update(dt, self.keys, self.world)
-        for mob in self.mobs:
-            mob.update(dt, self.world, self.player)
-        
-        self.world.ensure_chunks_around_player(self.player.position)
-        
-        self.handle_mob_interactions()
-        self.world.update_fluids()
-        self.time_of_day = (self.time_of_day + dt / 300) % 1  # Full day/night cycle in 5 minutes
-        self.update_lighting()
-        self.weather_system.update(dt)
+        with PROFILER.timer('update'):
+            self.player.update(dt, self.keys, self.world)
+            self.mobs.update(dt, [self.player])
+
+            with PROFILER.timer('chunk loading'):
+                self.world.ensure_chunks_around_player(self.player.position)
+
+            self.handle_mob_interactions()
+            self.world.update_fluids()
+            self.time_of_day = (self.time_of_day + dt / 300) % 1  # Full day/night cycle in 5 minutes
+            self.update_lighting()
+            with PROFILER.timer('weather'):
+                self.weather_system.update(dt, self.player.position)
+            self.auto_save.update(dt)
         self.info_label.y = self.height - 10  # Update label position if window is resized
 
     def handle_mob_interactions(self):
-        for mob in self.mobs:
-            if isinstance(mob, Zombie) and self.player.distance_to(mob.position) < 1.5:
-                self.player.take_damage(5)  # Zombie attacks player
+        for mob in self.world.entities.query_radius(self.player.position, 1.5, Zombie):
+            self.player.take_damage(5)  # Zombie attacks player
 
     def update_lighting(self):
+        # Only a multiplier on the light baked into meshes, so nothing is rebuilt
         self.ambient_light = 0.2 + 0.6 * math.sin(self.time_of_day * math.pi)
+        self.world.daylight = self.ambient_light
 
     def on_draw(self):
+        with PROFILER.timer('draw'):
+            self.draw_frame()
+        if PROFILER.enabled:
+            self.profiler_label.draw()
+
+    def draw_frame(self):
         self.clear()
         gl.glClearColor(0.5, 0.7, 1.0, 1.0)  # Light blue sky color
         gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
@@ -133,8 +171,7 @@ class Game(pyglet.window.Window):
         gl.glMatrixMode(gl.GL_MODELVIEW)
         gl.glLoadIdentity()
         
-        self.world.ensure_chunks_around_player(self.player.position)
-        self.player.update_camera(self)
+        self.player.update_camera(self, self.timestep.alpha)
         
         # Debug rendering
         gl.glColor3f(1, 0, 0)  # Red color
@@ -143,16 +180,24 @@ class Game(pyglet.window.Window):
         gl.glVertex3f(0, 0, 0)  # Origin point
         gl.glEnd()
         
-        self.world.draw()
+        with PROFILER.timer('world draw'):
+            self.world.draw()
+        self.weather_system.draw()
         
         for mob in self.mobs:
             mob.draw()
         
         self.set_2d()
+        self.player.inventory.draw(self)
         self.batch.draw()
         self.fps_display.draw()
         self.draw_player_info()
 
+    def on_close(self):
+        self.auto_save.wait()
+        self.world.shutdown()
+        super().on_close()
+
     def set_2d(self):
         width, height = self.get_size()
         gl.glDisable(gl.GL_DEPTH_TEST)
@@ -166,32 +211,49 @@ class Game(pyglet.window.Window):
     def draw_player_info(self):
         x, y, z = self.player.get_position()
         self.info_label.text = f"Player Position: ({x:.2f}, {y:.2f}, {z:.2f})"
-        self.info_label.text += f"\nChunks loaded: {len(self.world.chunks)}"
-        self.info_label.text += f"\nRendered vertices: {self.world.rendered_vertices}"
+        self.info_label.text += f"\nChunks loaded: {len(self.world.chunks)} (sections visible {self.world.visible_sections}, culled {self.world.culled_sections})"
+        self.info_label.text += f"\nRendered vertices: {self.world.rendered_vertices} ({self.world.mesh_mode} mesher)"
+        self.info_label.text += f"\nRendered quads: {self.world.rendered_quads}, meshing: {self.world.mesh_time * 1000:.1f} ms"
+        ai = self.mobs.scheduler.stats
+        timestep = self.timestep
+        self.info_label.text += (f"\nSimulation: {round(1 / timestep.dt)} Hz, {timestep.frame_ticks} ticks this frame, "
+                                 f"{timestep.dropped:.1f} s dropped")
+        self.info_label.text += "\nMob AI: " + ", ".join(
+            f"{name} {tier['updated']}/{tier['mobs']} {tier['time'] * 1000:.1f} ms" for name, tier in ai.items())
+        fluids = self.world.fluids
+        self.info_label.text += f"\nFluids: {fluids.updated}/{fluids.budget} cells updated, {fluids.active} active"
         self.info_label.draw()
 
+    def update_profiler_overlay(self, dt=0):
+        # Percentiles are worth recomputing a few times a second, not every frame
+        if PROFILER.enabled:
+            self.profiler_label.text = PROFILER.overlay_text()
+            self.profiler_label.position = (self.width - 10, self.height - 10)
+
+    def dump_profile(self):
+        for path in ('profile.json', 'profile.csv'):
+            PROFILER.dump(path)
+        print("Profile written to profile.json and profile.csv")
+
     def save_game(self):
-        SaveLoadManager.save_game(self.player, self.world)
+        SaveLoadManager.save_game(self.player, self.world, self.mobs)
         print("Game saved!")
 
     def load_game(self):
+        self.auto_save.wait()
         save_data = SaveLoadManager.load_game()
         if save_data:
-            self.player.position = save_data['player']['position']
-            self.player.health = save_data['player']['health']
-            self.player.inventory.items = save_data['player']['inventory']
-            self.world.seed = save_data['world']['seed']
-            self.world.regenerate()
-            for block_data in save_data['world']['modified_blocks']:
-                self.world.add_block(tuple(block_data['position']), block_data['block_type'])
+            SaveLoadManager.apply_loaded_data(save_data, self.player, self.world, self)
             print("Game loaded!")
         else:
             print("No save file found.")
 
     def run(self):
-        pyglet.clock.schedule(self.update)
+        pyglet.clock.schedule(self.timestep.advance)
+        pyglet.clock.schedule_interval(self.update_profiler_overlay, 0.5)
         pyglet.app.run()
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     window = Game(800, 600, caption='Minecraft Clone', resizable=True)
     window.run()
@@ -0,0 +1,162 @@
+import time
+import numpy as np
+from lighting import LIGHT_CURVE, MAX_LIGHT
+
+# Chunk meshing as pure functions over block arrays. Nothing here touches GL, so
+# meshes can be built on worker threads or processes and uploaded later on the
+# main thread, or benchmarked without a window.
+
+# Each face: the offset to the neighbouring voxel it faces and its four corners,
+# wound counter-clockwise when seen from outside the block
+FACES = (
+    ((0, 0, -1), ((0, 0, 0), (0, 1, 0), (1, 1, 0), (1, 0, 0))),  # Front face
+    ((0, 0, 1), ((0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1))),  # Back face
+    ((-1, 0, 0), ((0, 0, 0), (0, 0, 1), (0, 1, 1), (0, 1, 0))),  # Left face
+    ((1, 0, 0), ((1, 0, 0), (1, 1, 0), (1, 1, 1), (1, 0, 1))),  # Right face
+    ((0, 1, 0), ((0, 1, 0), (0, 1, 1), (1, 1, 1), (1, 1, 0))),  # Top face
+    ((0, -1, 0), ((0, 0, 0), (1, 0, 0), (1, 0, 1), (0, 0, 1))),  # Bottom face
+)
+# The axes each face's texture runs along (u, v): y is up on the sides
+FACE_UV_AXES = ((0, 1), (0, 1), (2, 1), (2, 1), (0, 2), (0, 2))
+
+MESH_MODES = ('culled', 'greedy', 'naive')
+
+class Mesh:
+    # Flat GL_QUADS buffers: 3 floats per vertex in positions, colors and
+    # normals (2 floats per vertex in tex_coords)
+    def __init__(self, positions, tex_coords, colors, normals, build_time=0.0):
+        self.positions = positions
+        self.tex_coords = tex_coords
+        self.colors = colors
+        self.normals = normals
+        self.build_time = build_time
+
+    @property
+    def vertex_count(self):
+        return len(self.positions) // 3
+
+    @property
+    def quad_count(self):
+        return self.vertex_count // 4
+
+def greedy_quads(face_ids):
+    # Greedy rectangle cover of a 2D grid of block ids (0 = no face).
+    # Returns (u, v, height, width, block_id) for each merged quad.
+    face_ids = face_ids.copy()
+    rows, cols = face_ids.shape
+    quads = []
+    for u, v in np.argwhere(face_ids).tolist():
+        block_id = face_ids[u, v]
+        if not block_id:
+            continue  # Already covered by an earlier quad
+        width = 1
+        while v + width < cols and face_ids[u, v + width] == block_id:
+            width += 1
+        height = 1
+        while u + height < rows and (face_ids[u + height, v:v + width] == block_id).all():
+            height += 1
+        face_ids[u:u + height, v:v + width] = 0
+        quads.append((u, v, height, width, int(block_id)))
+    return quads
+
+def greedy_faces(face_ids, offset):
+    # Merges coplanar faces of the same block into rectangles, one slice at a
+    # time along the face normal. Returns quad origins, sizes and block ids.
+    axis = offset.index(next(o for o in offset if o))
+    u_axis, v_axis = [a for a in range(3) if a != axis]
+    slices = np.moveaxis(face_ids, axis, 0)
+    origins = []
+    sizes = []
+    block_ids = []
+    for s in np.flatnonzero(slices.any(axis=(1, 2))).tolist():
+        for u, v, height, width, block_id in greedy_quads(slices[s]):
+            origin = [0, 0, 0]
+            origin[axis], origin[u_axis], origin[v_axis] = s, u, v
+            size = [1, 1, 1]
+            size[u_axis], size[v_axis] = height, width
+            origins.append(origin)
+            sizes.append(size)
+            block_ids.append(block_id)
+    return (np.array(origins, dtype=np.int64).reshape(-1, 3),
+            np.array(sizes, dtype=np.int64).reshape(-1, 3),
+            np.array(block_ids, dtype=np.int64))
+
+def padded_opacity(blocks, opacity_table, borders):
+    # Opacity of a block array with a one-voxel border. `borders` holds the
+    # opacity of the touching slab of each neighbour as (west, east, north,
+    # south, below, above), shaped like blocks[0], blocks[:, :, 0], blocks[:, 0]
+    # etc., or None where the neighbour holds no blocks or is not loaded, which
+    # counts as air.
+    size_x, height, size_z = blocks.shape
+    opaque = np.zeros((size_x + 2, height + 2, size_z + 2), dtype=bool)
+    opaque[1:-1, 1:-1, 1:-1] = opacity_table[blocks]
+    west, east, north, south, below, above = borders
+    if west is not None:
+        opaque[0, 1:-1, 1:-1] = west
+    if east is not None:
+        opaque[-1, 1:-1, 1:-1] = east
+    if north is not None:
+        opaque[1:-1, 1:-1, 0] = north
+    if south is not None:
+        opaque[1:-1, 1:-1, -1] = south
+    if below is not None:
+        opaque[1:-1, 0, 1:-1] = below
+    if above is not None:
+        opaque[1:-1, -1, 1:-1] = above
+    return opaque
+
+def build_mesh(blocks, uv_table, opacity_table, borders, light=None, mode='culled'):
+    # blocks: [x, y, z] array of block ids, e.g. one chunk section;
+    # uv_table ((u0, v0, u1, v1) of each block's atlas tile) and opacity_table
+    # are indexed by block id. light holds the light level of each voxel padded
+    # like padded_opacity, or None for full light; each face is coloured by the
+    # level of the voxel it faces. Returns a Mesh in coordinates local to the
+    # block array. Greedy quads stretch one tile over the whole merged
+    # rectangle, since a tile cannot repeat inside the atlas, and only merge
+    # faces lit alike.
+    start = time.perf_counter()
+    size_x, height, size_z = blocks.shape
+    solid = blocks != 0
+    if mode != 'naive':
+        opaque = padded_opacity(blocks, opacity_table, borders)
+    if light is None:
+        light = np.full((size_x + 2, height + 2, size_z + 2), MAX_LIGHT, dtype=np.uint8)
+    positions = []
+    tex_coords = []
+    colors = []
+    normals = []
+    for (offset, corners), uv_axes in zip(FACES, FACE_UV_AXES):
+        dx, dy, dz = offset
+        facing = light[1 + dx:size_x + 1 + dx, 1 + dy:height + 1 + dy, 1 + dz:size_z + 1 + dz]
+        if mode != 'naive':
+            hidden = opaque[1 + dx:size_x + 1 + dx, 1 + dy:height + 1 + dy, 1 + dz:size_z + 1 + dz]
+            visible = solid & ~hidden
+        else:
+            visible = solid
+        if mode == 'greedy':
+            # Faces are keyed by block id and light level, so both must match to merge
+            keys = np.where(visible, blocks.astype(np.int32) << 4 | facing, 0)
+            origins, sizes, keys = greedy_faces(keys, offset)
+            block_ids, levels = keys >> 4, keys & MAX_LIGHT
+        else:
+            origins = np.argwhere(visible)
+            sizes = np.ones_like(origins)
+            block_ids = blocks[visible]
+            levels = facing[visible]
+        if not len(origins):
+            continue
+        quads = origins[:, None, :] + np.array(corners)[None, :, :] * sizes[:, None, :]
+        positions.append(quads.reshape(-1))
+        uvs = uv_table[block_ids][:, None, :]
+        corner_uvs = np.array(corners)[None, :, list(uv_axes)]
+        tex_coords.append((uvs[:, :, :2] + corner_uvs * (uvs[:, :, 2:] - uvs[:, :, :2])).reshape(-1))
+        colors.append(np.repeat(LIGHT_CURVE[levels], 12))
+        normals.append(np.tile(np.array(offset, dtype=np.float32), len(origins) * 4))
+    if not positions:
+        empty = np.zeros(0, dtype=np.float32)
+        return Mesh(empty, empty, empty, empty, time.perf_counter() - start)
+    return Mesh(np.concatenate(positions).astype(np.float32),
+                np.concatenate(tex_coords).astype(np.float32),
+                np.concatenate(colors),
+                np.concatenate(normals),
+                time.perf_counter() - start)
@@ -1,8 +1,203 @@
 import random
 import math
+import time
+import numpy as np
+import physics
+from player import Player
+from profiler import PROFILER
+
+def field(name):
+    # Attribute stored in the mob's row of its group's arrays
+    def get(self):
+        value = self.group.arrays[name][self.slot]
+        return value.item() if value.ndim == 0 else value
+
+    def set(self, value):
+        self.group.arrays[name][self.slot] = value
+
+    return property(get, set)
+
+class MobGroup:
+    # State of every mob of one kind in contiguous arrays with one row per mob,
+    # so the whole kind can be advanced in vectorized steps. Mob objects are
+    # views of their row; a mob outside any MobManager has a group of its own.
+    def __init__(self, mob_class, capacity=1):
+        self.mob_class = mob_class
+        self.mobs = []  # Slot -> Mob
+        self.arrays = {name: np.zeros((capacity,) + shape, dtype=dtype)
+                       for name, (shape, dtype) in mob_class.fields.items()}
+        # Entity index cell each row was last filed under, to skip index updates
+        # for mobs that stayed in their cell
+        self.cells = np.zeros((capacity, 2), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.mobs)
+
+    def add(self, mob):
+        # Takes the mob over from its current group, copying its state
+        slot = len(self.mobs)
+        if slot == len(self.cells):
+            for name, array in self.arrays.items():
+                self.arrays[name] = np.concatenate([array, np.zeros_like(array)])
+            self.cells = np.concatenate([self.cells, np.zeros_like(self.cells)])
+        if mob.group is not None:
+            for name, array in self.arrays.items():
+                array[slot] = mob.group.arrays[name][mob.slot]
+            mob.group.remove(mob)
+        self.cells[slot] = np.iinfo(np.int64).min
+        self.mobs.append(mob)
+        mob.group, mob.slot = self, slot
+
+    def remove(self, mob):
+        # Moves the last row into the freed one to keep the arrays packed
+        slot = mob.slot
+        last = len(self.mobs) - 1
+        if slot != last:
+            moved = self.mobs[last]
+            for array in self.arrays.values():
+                array[slot] = array[last]
+            self.cells[slot] = self.cells[last]
+            self.mobs[slot] = moved
+            moved.slot = slot
+        self.mobs.pop()
+        mob.group, mob.slot = None, None
+
+    def reindex(self, rows, entities):
+        positions = self.arrays['position'][rows]
+        cells = np.floor(positions[:, [0, 2]] / entities.cell_size).astype(np.int64)
+        moved = rows[(cells != self.cells[rows]).any(axis=1)]
+        self.cells[rows] = cells
+        for slot in moved.tolist():
+            entities.update(self.mobs[slot])
+
+# AI level of detail: (name, max distance to the nearest player, update every
+# n ticks), nearest first. Mobs in chunks that are not loaded are frozen.
+TIERS = (
+    ('near', 24, 1),
+    ('mid', 64, 4),
+    ('far', math.inf, 8),
+)
+
+class TickScheduler:
+    # Decides which mobs update this tick. A mob in a reduced-rate tier is
+    # handed all the time it skipped when it does update, so it covers the
+    # same ground as at full rate. Updates are spread over ticks by slot so a
+    # tier does not all land on the same frame. Frozen mobs do not accumulate
+    # time; they pick up where they stopped once their chunk loads again.
+    def __init__(self, tiers=TIERS):
+        self.tiers = tiers
+        self.ticks = 0
+        self.stats = {}
+
+    def assign(self, group, world, players):
+        # Tier index of each row; len(self.tiers) means frozen
+        count = len(group)
+        positions = group.arrays['position'][:count]
+        if players:
+            player_positions = np.array([player.position for player in players], dtype=np.float64)
+            offsets = positions[:, None, [0, 2]] - player_positions[None, :, [0, 2]]
+            distances = np.sqrt((offsets ** 2).sum(axis=2).min(axis=1))
+        else:
+            distances = np.full(count, math.inf)
+        limits = np.array([max_distance for _, max_distance, _ in self.tiers])
+        tiers = np.minimum(np.searchsorted(limits, distances), len(self.tiers) - 1)
+        chunk_positions, inverse = world.chunk_keys(np.floor(positions[:, [0, 2]]).astype(np.int64))
+        loaded = np.array([chunk_pos in world.chunks for chunk_pos in chunk_positions])
+        return np.where(loaded[inverse], tiers, len(self.tiers))
+
+    def update(self, groups, dt, world, players, rng):
+        self.ticks += 1
+        stats = {name: {'mobs': 0, 'updated': 0, 'time': 0.0} for name, _, _ in self.tiers}
+        stats['frozen'] = {'mobs': 0, 'updated': 0, 'time': 0.0}
+        for group in groups:
+            if not len(group):
+                continue
+            rows = np.arange(len(group))
+            tiers = self.assign(group, world, players)
+            stats['frozen']['mobs'] += int((tiers == len(self.tiers)).sum())
+            pending = group.arrays['pending_dt']
+            for tier, (name, _, every) in enumerate(self.tiers):
+                members = rows[tiers == tier]
+                if not len(members):
+                    continue
+                pending[members] += dt
+                due = members[(members + self.ticks) % every == 0]
+                stats[name]['mobs'] += len(members)
+                stats[name]['updated'] += len(due)
+                if len(due):
+                    start = time.perf_counter()
+                    group.mob_class.update_many(group, due, pending[due], world, players, rng)
+                    pending[due] = 0
+                    stats[name]['time'] += time.perf_counter() - start
+        self.stats = stats
+
+class MobManager:
+    # Every mob in the game, stored by kind in MobGroups and updated a whole
+    # kind at a time, at a rate set by the TickScheduler
+    def __init__(self, world, seed=None):
+        self.world = world
+        self.groups = {}  # Mob class -> MobGroup
+        self.rng = np.random.default_rng(seed)
+        self.scheduler = TickScheduler()
+
+    def __len__(self):
+        return sum(len(group) for group in self.groups.values())
+
+    def __iter__(self):
+        for group in list(self.groups.values()):
+            yield from list(group.mobs)
+
+    def add(self, mob):
+        group = self.groups.get(type(mob))
+        if group is None:
+            group = self.groups[type(mob)] = MobGroup(type(mob), capacity=64)
+        group.add(mob)
+        self.world.entities.update(mob)
+
+    def remove(self, mob):
+        # The mob keeps its state in a group of its own
+        MobGroup(type(mob)).add(mob)
+        self.world.entities.remove(mob)
+
+    def clear(self):
+        for mob in list(self):
+            self.remove(mob)
+
+    def update(self, dt, players):
+        with PROFILER.timer('mob ai'):
+            self.world.pathfinder.new_tick()
+            self.scheduler.update(list(self.groups.values()), dt, self.world, players, self.rng)
+            self.remove_dead()
+
+    def remove_dead(self):
+        for group in self.groups.values():
+            dead = np.flatnonzero(group.arrays['health'][:len(group)] <= 0)
+            for mob in [group.mobs[slot] for slot in dead.tolist()]:
+                self.remove(mob)
 
 class Mob:
+    fields = {
+        'position': ((3,), np.float64),
+        'direction': ((3,), np.float64),
+        'health': ((), np.float64),
+        'speed': ((), np.float64),
+        'update_interval': ((), np.float64),
+        'time_since_last_update': ((), np.float64),
+        'pending_dt': ((), np.float64),  # Time skipped by the TickScheduler
+    }
+    position = field('position')
+    direction = field('direction')
+    health = field('health')
+    speed = field('speed')
+    update_interval = field('update_interval')
+    time_since_last_update = field('time_since_last_update')
+    width = 0.6
+    height = 1.8
+    group = None
+    slot = None
+
     def __init__(self, position, mob_type):
+        MobGroup(type(self)).add(self)
         self.position = list(position)
         self.mob_type = mob_type
         self.health = 20
@@ -16,19 +211,62 @@ class Mob:
         if self.time_since_last_update >= self.update_interval:
             self.update_direction(world, player)
             self.time_since_last_update = 0
+        self.steer()
 
-        new_position = [
-            self.position[0] + self.direction[0] * self.speed * dt,
-            self.position[1] + self.direction[1] * self.speed * dt,
-            self.position[2] + self.direction[2] * self.speed * dt
-        ]
+        motion = [d * self.speed * dt for d in self.direction]
+        self.position = physics.move(world, self.position, self.width, self.height, motion).position
+        world.entities.update(self)
+
+    @classmethod
+    def update_many(cls, group, rows, dt, world, players, rng):
+        # Mob.update for the given rows of a group at once. dt is a number or
+        # one value per row.
+        arrays = group.arrays
+        dt = np.broadcast_to(np.asarray(dt, dtype=np.float64), rows.shape)
+        arrays['time_since_last_update'][rows] += dt
+        due = rows[arrays['time_since_last_update'][rows] >= arrays['update_interval'][rows]]
+        if len(due):
+            cls.update_directions(group, due, world, players, rng)
+            arrays['time_since_last_update'][due] = 0
+        cls.steer_many(group, rows)
 
-        if not world.collide(new_position):
-            self.position = new_position
+        motions = arrays['direction'][rows] * (arrays['speed'][rows] * dt)[:, None]
+        positions, _ = physics.move_many(world, arrays['position'][rows], cls.width, cls.height, motions)
+        arrays['position'][rows] = positions
+        group.reindex(rows, world.entities)
 
     def update_direction(self, world, player):
         pass  # To be implemented by subclasses
 
+    @classmethod
+    def update_directions(cls, group, rows, world, players, rng):
+        pass  # To be implemented by subclasses
+
+    def steer(self):
+        pass  # Per-tick steering between direction updates, for subclasses
+
+    @classmethod
+    def steer_many(cls, group, rows):
+        pass
+
+    def wander(self):
+        # Simple random movement
+        self.direction = [
+            random.uniform(-1, 1),
+            0,  # No vertical movement
+            random.uniform(-1, 1)
+        ]
+        # Normalize the direction vector
+        magnitude = math.sqrt(sum(d*d for d in self.direction))
+        self.direction = [d / magnitude for d in self.direction]
+
+    @staticmethod
+    def wander_many(group, rows, rng):
+        directions = np.zeros((len(rows), 3))
+        directions[:, [0, 2]] = rng.uniform(-1, 1, (len(rows), 2))
+        directions /= np.linalg.norm(directions, axis=1)[:, None]
+        group.arrays['direction'][rows] = directions
+
     def take_damage(self, amount):
         self.health -= amount
         if self.health <= 0:
@@ -45,21 +283,46 @@ class Mob:
         # Simplified drawing (no actual rendering)
         pass
 
+def nearest_players(positions, players, max_distance):
+    # For each position, the index of the nearest player within max_distance,
+    # or -1
+    if not players:
+        return np.full(len(positions), -1)
+    player_positions = np.array([player.position for player in players], dtype=np.float64)
+    distances = ((positions[:, None, :] - player_positions[None, :, :]) ** 2).sum(axis=2)
+    nearest = distances.argmin(axis=1)
+    in_range = distances[np.arange(len(positions)), nearest] <= max_distance * max_distance
+    return np.where(in_range, nearest, -1)
+
+def waypoint_directions(offsets):
+    # Directions towards waypoints at the given offsets: walk straight at them,
+    # climbing at full speed while below one so steps are cleared, and only
+    # descending when clearly above it, so a mob that overshoots a step does
+    # not sink back against its edge
+    directions = np.zeros_like(offsets)
+    horizontal = np.hypot(offsets[:, 0], offsets[:, 2])
+    moving = horizontal > 0
+    directions[moving, 0] = offsets[moving, 0] / horizontal[moving]
+    directions[moving, 2] = offsets[moving, 2] / horizontal[moving]
+    directions[:, 1] = np.where(offsets[:, 1] > 1e-3, 1, np.where(offsets[:, 1] < -0.05, -1, 0))
+    return directions
+
 class Sheep(Mob):
+    fields = dict(Mob.fields, wool_grown=((), np.bool_))
+    wool_grown = field('wool_grown')
+    width = 0.9
+    height = 1.3
+
     def __init__(self, position):
         super().__init__(position, 'sheep')
         self.wool_grown = True
 
     def update_direction(self, world, player):
-        # Simple random movement
-        self.direction = [
-            random.uniform(-1, 1),
-            0,  # No vertical movement
-            random.uniform(-1, 1)
-        ]
-        # Normalize the direction vector
-        magnitude = math.sqrt(sum(d*d for d in self.direction))
-        self.direction = [d / magnitude for d in self.direction]
+        self.wander()
+
+    @classmethod
+    def update_directions(cls, group, rows, world, players, rng):
+        cls.wander_many(group, rows, rng)
 
     def shear(self):
         if self.wool_grown:
@@ -73,29 +336,131 @@ class Sheep(Mob):
             if random.random() < 0.001:  # Small chance to regrow wool each update
                 self.wool_grown = True
 
+    @classmethod
+    def update_many(cls, group, rows, dt, world, players, rng):
+        super().update_many(group, rows, dt, world, players, rng)
+        wool_grown = group.arrays['wool_grown']
+        shorn = rows[~wool_grown[rows]]
+        wool_grown[shorn[rng.random(len(shorn)) < 0.001]] = True
+
 class Zombie(Mob):
+    fields = dict(Mob.fields, attack_cooldown=((), np.float64),
+                  waypoint=((3,), np.float64), following=((), np.bool_))
+    attack_cooldown = field('attack_cooldown')
+    waypoint = field('waypoint')  # Where the zombie is heading on its path
+    following = field('following')  # Is it on a path?
+    height = 1.95
+    attack_range = 1.5
+    attack_interval = 1.0  # Attack once per second
+    follow_range = 24
+    waypoint_radius = 0.3
+
     def __init__(self, position):
         super().__init__(position, 'zombie')
-        self.attack_range = 1.5
         self.attack_cooldown = 0
-        self.attack_interval = 1.0  # Attack once per second
+        self.path = []  # Cells still to walk through after the waypoint
+
+    def plan_route(self, world, target):
+        # Follows a path to the target if the shared path finder has one
+        path = world.pathfinder.find_path(self.position, target.position)
+        self.path = list(path) if path else []
+        self.next_waypoint()
+
+    def next_waypoint(self):
+        if self.path:
+            x, y, z = self.path.pop(0)
+            self.waypoint = (x + 0.5, y, z + 0.5)
+            self.following = True
+        else:
+            self.following = False
 
     def update_direction(self, world, player):
-        # Move towards the player
+        # Move towards the nearest player in range, otherwise wander
+        target = world.entities.nearest(self.position, Player, self.follow_range)
+        if target is None:
+            self.following = False
+            self.wander()
+            return
+        self.plan_route(world, target)
+        if self.following:
+            return
+        # No path (yet): head straight for the target
         direction = [
-            player.position[0] - self.position[0],
+            target.position[0] - self.position[0],
             0,  # No vertical movement
-            player.position[2] - self.position[2]
+            target.position[2] - self.position[2]
         ]
         magnitude = math.sqrt(sum(d*d for d in direction))
         self.direction = [d / magnitude for d in direction] if magnitude > 0 else [0, 0, 0]
 
+    @classmethod
+    def update_directions(cls, group, rows, world, players, rng):
+        positions = group.arrays['position'][rows]
+        targets = nearest_players(positions, players, cls.follow_range)
+        group.arrays['following'][rows[targets < 0]] = False
+        cls.wander_many(group, rows[targets < 0], rng)
+        chasing = targets >= 0
+        if chasing.any():
+            for slot, target in zip(rows[chasing].tolist(), targets[chasing].tolist()):
+                group.mobs[slot].plan_route(world, players[target])
+            # Those without a path head straight for their target
+            player_positions = np.array([player.position for player in players], dtype=np.float64)
+            directions = player_positions[targets[chasing]] - positions[chasing]
+            directions[:, 1] = 0  # No vertical movement
+            magnitude = np.linalg.norm(directions, axis=1)[:, None]
+            direct = ~group.arrays['following'][rows[chasing]]
+            group.arrays['direction'][rows[chasing][direct]] = np.divide(
+                directions, magnitude, out=np.zeros_like(directions), where=magnitude > 0)[direct]
+
+    def steer(self):
+        # Head for the waypoint, moving on to the next one once it is reached
+        if not self.following:
+            return
+        offset = [w - p for w, p in zip(self.waypoint, self.position)]
+        if math.hypot(offset[0], offset[2]) < self.waypoint_radius and abs(offset[1]) < 0.5:
+            self.next_waypoint()
+            if not self.following:
+                self.direction = [0, 0, 0]
+                return
+            offset = [w - p for w, p in zip(self.waypoint, self.position)]
+        self.direction = list(waypoint_directions(np.array([offset]))[0])
+
+    @classmethod
+    def steer_many(cls, group, rows):
+        arrays = group.arrays
+        following = rows[arrays['following'][rows]]
+        if not len(following):
+            return
+        offsets = arrays['waypoint'][following] - arrays['position'][following]
+        reached = ((np.hypot(offsets[:, 0], offsets[:, 2]) < cls.waypoint_radius) &
+                   (np.abs(offsets[:, 1]) < 0.5))
+        if reached.any():
+            for slot in following[reached].tolist():
+                group.mobs[slot].next_waypoint()
+            arrays['direction'][following[reached]] = 0
+            following = rows[arrays['following'][rows]]
+            offsets = arrays['waypoint'][following] - arrays['position'][following]
+        arrays['direction'][following] = waypoint_directions(offsets)
+
     def update(self, dt, world, player):
         super().update(dt, world, player)
         self.attack_cooldown = max(0, self.attack_cooldown - dt)
-        if self.distance_to(player.position) <= self.attack_range and self.attack_cooldown == 0:
-            self.attack(player)
+        if self.attack_cooldown == 0:
+            targets = world.entities.query_radius(self.position, self.attack_range, Player)
+            if targets:
+                self.attack(targets[0])
+
+    @classmethod
+    def update_many(cls, group, rows, dt, world, players, rng):
+        super().update_many(group, rows, dt, world, players, rng)
+        cooldowns = group.arrays['attack_cooldown']
+        cooldowns[rows] = np.maximum(0, cooldowns[rows] - dt)
+        ready = rows[cooldowns[rows] == 0]
+        if len(ready):
+            targets = nearest_players(group.arrays['position'][ready], players, cls.attack_range)
+            for slot, target in zip(ready[targets >= 0].tolist(), targets[targets >= 0].tolist()):
+                group.mobs[slot].attack(players[target])
 
     def attack(self, player):
         player.take_damage(5)  # Zombie deals 5 damage
-        self.attack_cooldown = self.attack_interval
\ No newline at end of file
+        self.attack_cooldown = self.attack_interval
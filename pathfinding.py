@@ -0,0 +1,255 @@
+import heapq
+import math
+import time
+from physics import EPSILON
+
+# Path search over the cells of the voxel grid a mob can stand in: a cell
+# (x, y, z) is standable when the block below it is solid and the `clearance`
+# blocks from y upwards are not. From a cell a mob can walk to the four
+# horizontal neighbours, step up at most max_step blocks, or walk off an edge
+# and drop at most max_drop blocks.
+
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+STEP_UP_COST = 0.5  # Extra cost per block climbed
+DROP_COST = 0.1  # Extra cost per block dropped
+
+class SearchTree:
+    # Cheapest routes to one goal cell, grown outwards from the goal (Dijkstra
+    # over reversed moves) only as far as callers need. Every settled cell's
+    # route is known, so one tree serves a whole horde heading for the same
+    # goal, and growth stops and resumes across ticks.
+    def __init__(self, goal):
+        self.goal = goal
+        self.open_cells = [(0, goal)]
+        self.costs = {goal: 0}
+        self.next_cell = {goal: None}  # Cell -> next cell on its way to the goal
+        self.settled = set()
+        self.waiting = set()  # Start cells asked for but not settled yet
+        self.columns = set()  # (x, z) columns its settled routes looked at
+        self.low = math.inf  # and the range of heights they looked at in them
+        self.high = -math.inf
+        self.requested = 0  # Tick it was last asked for
+
+    def looked_at(self, position):
+        x, y, z = position
+        return self.low <= y <= self.high and (x, z) in self.columns
+
+class PathFinder:
+    # Shared by every mob. Paths are cached by (start cell, goal cell) and
+    # dropped when a block changes in any column they cross; search trees and
+    # failed searches likewise only start over when an edit falls in the area
+    # they searched. Searches expand at most tick_budget cells and for at most
+    # tick_time seconds per tick between them, counted from new_tick; until a
+    # route is found, find_path returns None and callers can steer directly
+    # and ask again.
+    def __init__(self, world, clearance=2, max_step=1, max_drop=3, max_nodes=16000,
+                 tick_budget=500, tick_time=0.004, max_paths=512, retry_ticks=60):
+        self.world = world
+        self.clearance = clearance
+        self.max_step = max_step
+        self.max_drop = max_drop
+        # Furthest above or below a settled cell that finding its predecessors looks
+        self.reach = max_step + max_drop + clearance + 1
+        self.max_nodes = max_nodes  # Cells a search tree may settle
+        self.tick_budget = tick_budget
+        # Cells cost tens of microseconds each depending on the terrain, so
+        # searching also stops at a deadline well inside a 60 Hz tick
+        self.tick_time = tick_time
+        self.max_paths = max_paths
+        # Ticks before a failed search is tried again, and before a search tree
+        # nobody asked about again is given up
+        self.retry_ticks = retry_ticks
+        self.paths = {}  # (start, goal) -> [start, ..., goal], oldest first
+        self.columns = {}  # (x, z) -> keys of cached paths crossing that column
+        # (start, goal) -> (tick after which to search again, its search tree)
+        self.failed = {}
+        self.trees = {}  # Goal -> SearchTree
+        self.solid_cache = {}  # (x, z) -> {y: solid}
+        self.tick = 0
+        self.budget = tick_budget
+        self.deadline = math.inf  # perf_counter() at which this tick's searching stops
+        self.stats = {'searches': 0, 'cache_hits': 0, 'nodes': 0, 'deferred': 0}
+
+    def new_tick(self):
+        # Grows search trees that callers are waiting on with this tick's budget
+        self.tick += 1
+        self.budget = self.tick_budget
+        self.deadline = time.perf_counter() + self.tick_time
+        self.solid_cache.clear()  # Chunks may have loaded or unloaded since
+        for goal, tree in list(self.trees.items()):
+            if tree.requested < self.tick - self.retry_ticks:
+                del self.trees[goal]
+            elif tree.waiting and self.budget > 0:
+                self.grow(tree)
+
+    def solid(self, x, y, z):
+        # Memoised for the rest of the tick, or until the column is edited
+        column = self.solid_cache.get((x, z))
+        if column is None:
+            column = self.solid_cache[(x, z)] = {}
+        try:
+            return column[y]
+        except KeyError:
+            solid = column[y] = self.world.is_solid((x, y, z))
+            return solid
+
+    def clear_above(self, x, y, z, height):
+        for h in range(height):
+            if self.solid(x, y + h, z):
+                return False
+        return True
+
+    def standable(self, x, y, z):
+        return self.solid(x, y - 1, z) and self.clear_above(x, y, z, self.clearance)
+
+    def ground(self, position):
+        # The standable cell at or at most max_drop below position, or None.
+        # Feet resting on a block can sit a rounding error below its top.
+        x, y, z = math.floor(position[0]), math.floor(position[1] + EPSILON), math.floor(position[2])
+        for ny in range(y, y - self.max_drop - 1, -1):
+            if self.standable(x, ny, z):
+                return (x, ny, z)
+        return None
+
+    def step(self, cell, dx, dz):
+        # Where a mob standing in cell ends up moving one block along (dx, dz),
+        # as (cell, cost), or None if it cannot
+        x, y, z = cell
+        nx, nz = x + dx, z + dz
+        if self.clear_above(nx, y, nz, self.clearance):
+            # Walk across, or off the edge down to the first block below
+            for ny in range(y, y - self.max_drop - 1, -1):
+                if self.solid(nx, ny - 1, nz):
+                    return (nx, ny, nz), 1 + (y - ny) * DROP_COST
+            return None
+        for rise in range(1, self.max_step + 1):
+            # Climbing needs headroom above the current cell
+            if self.solid(x, y + self.clearance + rise - 1, z):
+                return None
+            if self.standable(nx, y + rise, nz):
+                return (nx, y + rise, nz), 1 + rise * STEP_UP_COST
+        return None
+
+    def neighbours(self, cell):
+        for dx, dz in NEIGHBOURS:
+            move = self.step(cell, dx, dz)
+            if move is not None:
+                yield move
+
+    def predecessors(self, cell):
+        # Cells from which one step leads into cell, with the step's cost
+        x, y, z = cell
+        for dx, dz in NEIGHBOURS:
+            px, pz = x - dx, z - dz
+            for py in range(y - self.max_step, y + self.max_drop + 1):
+                if self.standable(px, py, pz):
+                    move = self.step((px, py, pz), dx, dz)
+                    if move is not None and move[0] == cell:
+                        yield (px, py, pz), move[1]
+
+    def grow(self, tree):
+        # Settles cells in order of cost to the goal until every waiting start
+        # is settled, the tick's budget or time runs out or the tree reaches
+        # max_nodes. Starts the tree can no longer reach are marked failed.
+        open_cells, costs = tree.open_cells, tree.costs
+        while tree.waiting and self.budget > 0 and time.perf_counter() < self.deadline:
+            if not open_cells or len(tree.settled) >= self.max_nodes:
+                for start in tree.waiting:
+                    self.failed[(start, tree.goal)] = (self.tick + self.retry_ticks, tree)
+                tree.waiting.clear()
+                return
+            cost, cell = heapq.heappop(open_cells)
+            if cell in tree.settled:
+                continue  # Already reached more cheaply
+            tree.settled.add(cell)
+            tree.waiting.discard(cell)
+            # Its predecessors were found by looking at the blocks around it
+            x, y, z = cell
+            tree.columns.add((x, z))
+            tree.columns.update((x + dx, z + dz) for dx, dz in NEIGHBOURS)
+            tree.low = min(tree.low, y - self.reach)
+            tree.high = max(tree.high, y + self.reach)
+            self.budget -= 1
+            self.stats['nodes'] += 1
+            for previous, step in self.predecessors(cell):
+                new_cost = cost + step
+                if new_cost < costs.get(previous, math.inf):
+                    costs[previous] = new_cost
+                    tree.next_cell[previous] = cell
+                    heapq.heappush(open_cells, (new_cost, previous))
+
+    def find_path(self, start_position, goal_position):
+        # Cells to walk through from start_position to goal_position, both
+        # taken as the ground under them, excluding the start cell. None if
+        # there is no path or the search has not got there yet.
+        start = self.ground(start_position)
+        goal = self.ground(goal_position)
+        if start is None or goal is None:
+            return None
+        key = (start, goal)
+        path = self.paths.get(key)
+        if path is not None:
+            self.stats['cache_hits'] += 1
+            return path[1:]
+        failed = self.failed.get(key)
+        if failed is not None and failed[0] >= self.tick:
+            return None
+        tree = self.trees.get(goal)
+        if tree is None:
+            tree = self.trees[goal] = SearchTree(goal)
+        tree.requested = self.tick
+        if start in tree.settled:
+            self.stats['cache_hits'] += 1
+        else:
+            if start not in tree.waiting:
+                tree.waiting.add(start)
+                self.stats['searches'] += 1
+            self.grow(tree)
+            if start not in tree.settled:
+                if start in tree.waiting:
+                    self.stats['deferred'] += 1  # Continued on later ticks
+                return None
+        path = [start]
+        while path[-1] != goal:
+            path.append(tree.next_cell[path[-1]])
+        self.store(key, path)
+        return path[1:]
+
+    def store(self, key, path):
+        if len(self.paths) >= self.max_paths:
+            self.drop(next(iter(self.paths)))
+        self.paths[key] = path
+        for x, y, z in path:
+            self.columns.setdefault((x, z), set()).add(key)
+
+    def drop(self, key):
+        path = self.paths.pop(key, None)
+        if path is None:
+            return
+        for x, y, z in path:
+            keys = self.columns.get((x, z))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.columns[(x, z)]
+
+    def invalidate(self, positions):
+        # Blocks changed: drop the cached paths crossing their columns, and
+        # the search trees and failed searches that may have looked at them,
+        # since they saw the old blocks. Everything searched elsewhere still
+        # holds.
+        for x, y, z in positions:
+            for key in list(self.columns.get((x, z), ())):
+                self.drop(key)
+            self.solid_cache.pop((x, z), None)
+        self.trees = {goal: tree for goal, tree in self.trees.items()
+                      if not any(tree.looked_at(position) for position in positions)}
+        self.failed = {key: failed for key, failed in self.failed.items()
+                       if failed[0] >= self.tick and not any(failed[1].looked_at(position) for position in positions)}
+
+    def clear(self):
+        self.paths.clear()
+        self.columns.clear()
+        self.failed.clear()
+        self.trees.clear()
+        self.solid_cache.clear()
@@ -0,0 +1,256 @@
+import math
+import numpy as np
+from blocks import BLOCKS
+
+# Collision and ray queries against the voxel grid.
+#
+# Collision: entity boxes are described by the position of the centre of their
+# feet plus a width and height. Motion is swept one axis at a time (y, then x,
+# then z), and only the voxels the box's leading face crosses are looked up.
+
+EPSILON = 1e-7
+OTHER_AXES = ((1, 2), (0, 2), (0, 1))
+
+class MoveResult:
+    def __init__(self, position, normals):
+        self.position = position
+        # Contact normals of the surfaces hit, e.g. (0, 1, 0) for standing on ground
+        self.normals = normals
+
+    @property
+    def on_ground(self):
+        return (0, 1, 0) in self.normals
+
+    def hit(self, axis):
+        return any(normal[axis] for normal in self.normals)
+
+def entity_box(position, width, height):
+    half = width / 2
+    x, y, z = position
+    return [x - half, y, z - half], [x + half, y + height, z + half]
+
+def voxel_range(low, high):
+    # Voxel indices overlapped by the open interval (low, high)
+    return range(math.floor(low + EPSILON), math.ceil(high - EPSILON))
+
+def overlaps(world, position, width, height):
+    low, high = entity_box(position, width, height)
+    for x in voxel_range(low[0], high[0]):
+        for y in voxel_range(low[1], high[1]):
+            for z in voxel_range(low[2], high[2]):
+                if world.is_solid((x, y, z)):
+                    return True
+    return False
+
+def sweep_axis(world, low, high, axis, distance):
+    # Moves the box [low, high) along one axis, stopping at the first solid
+    # voxel layer. Returns the distance actually travelled.
+    if distance > 0:
+        layers = range(math.ceil(high[axis] - EPSILON), math.ceil(high[axis] + distance))
+    else:
+        layers = range(math.floor(low[axis] + EPSILON) - 1, math.floor(low[axis] + distance) - 1, -1)
+    if not layers:
+        return distance  # The leading face stays inside the same voxel layer
+    first_axis, second_axis = OTHER_AXES[axis]
+    first = voxel_range(low[first_axis], high[first_axis])
+    second = voxel_range(low[second_axis], high[second_axis])
+    is_solid = world.is_solid
+    voxel = [0, 0, 0]
+    for layer in layers:
+        voxel[axis] = layer
+        for i in first:
+            voxel[first_axis] = i
+            for j in second:
+                voxel[second_axis] = j
+                if is_solid(voxel):
+                    return layer - high[axis] if distance > 0 else layer + 1 - low[axis]
+    return distance
+
+def move(world, position, width, height, motion):
+    # Sweeps an entity box by motion = (dx, dy, dz) and returns a MoveResult
+    # with the resolved position and the normals of every surface touched.
+    low, high = entity_box(position, width, height)
+    normals = []
+    for axis in (1, 0, 2):
+        distance = motion[axis]
+        if not distance:
+            continue
+        travelled = sweep_axis(world, low, high, axis, distance)
+        if travelled != distance:
+            normal = [0, 0, 0]
+            normal[axis] = -1 if distance > 0 else 1
+            normals.append(tuple(normal))
+        low[axis] += travelled
+        high[axis] += travelled
+    return MoveResult([(low[0] + high[0]) / 2, low[1], (low[2] + high[2]) / 2], normals)
+
+def move_many(world, positions, widths, heights, motions):
+    # Batched move for N entities: positions and motions are (N, 3) arrays,
+    # widths and heights (N,). Returns (positions, hits) where hits[i, axis] is
+    # True if entity i was stopped along that axis. Moves of under half a block
+    # per axis, the usual per-tick case, cross at most one voxel layer and are
+    # resolved for all entities together; longer ones fall back to move().
+    positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+    motions = np.asarray(motions, dtype=np.float64).reshape(-1, 3)
+    widths = np.broadcast_to(np.asarray(widths, dtype=np.float64), len(positions))
+    heights = np.broadcast_to(np.asarray(heights, dtype=np.float64), len(positions))
+    hits = np.zeros(positions.shape, dtype=bool)
+    long_moves = np.flatnonzero((np.abs(motions) >= 0.5).any(axis=1))
+    for i in long_moves.tolist():
+        result = move(world, positions[i], widths[i], heights[i], motions[i])
+        positions[i] = result.position
+        hits[i] = [result.hit(axis) for axis in range(3)]
+
+    short = np.ones(len(positions), dtype=bool)
+    short[long_moves] = False
+    half = widths / 2
+    low = positions - np.stack([half, np.zeros_like(half), half], axis=1)
+    high = positions + np.stack([half, heights, half], axis=1)
+    for axis in (1, 0, 2):
+        distance = motions[:, axis]
+        # Rows whose leading face enters a new voxel layer this step
+        forward = distance > 0
+        layer = np.where(forward, np.ceil(high[:, axis] - EPSILON), np.floor(low[:, axis] + EPSILON) - 1)
+        crosses = short & np.where(forward, layer < np.ceil(high[:, axis] + distance),
+                                   (distance < 0) & (layer >= np.floor(low[:, axis] + distance)))
+        rows = np.flatnonzero(crosses)
+        if len(rows):
+            blocked = layer_blocked(world, low[rows], high[rows], axis, layer[rows].astype(np.int64))
+            stopped = rows[blocked]
+            distance = distance.copy()
+            distance[stopped] = np.where(forward[stopped], layer[stopped] - high[stopped, axis],
+                                         layer[stopped] + 1 - low[stopped, axis])
+            hits[stopped, axis] = True
+        low[short, axis] += distance[short]
+        high[short, axis] += distance[short]
+    positions[short] = (low[short] + high[short]) / 2
+    positions[short, 1] = low[short, 1]
+    return positions, hits
+
+def layer_blocked(world, low, high, axis, layer):
+    # For each box, is any solid voxel in the given layer along axis, within
+    # the box's footprint on the other two axes?
+    first_axis, second_axis = OTHER_AXES[axis]
+    starts = []
+    counts = []
+    for other in (first_axis, second_axis):
+        start = np.floor(low[:, other] + EPSILON).astype(np.int64)
+        starts.append(start)
+        counts.append(np.ceil(high[:, other] - EPSILON).astype(np.int64) - start)
+    first = np.arange(counts[0].max())
+    second = np.arange(counts[1].max())
+    valid = ((first[None, :, None] < counts[0][:, None, None]) &
+             (second[None, None, :] < counts[1][:, None, None]))
+    voxels = np.empty(valid.shape + (3,), dtype=np.int64)
+    voxels[..., axis] = layer[:, None, None]
+    voxels[..., first_axis] = starts[0][:, None, None] + first[None, :, None]
+    voxels[..., second_axis] = starts[1][:, None, None] + second[None, None, :]
+    solid = np.zeros(valid.shape, dtype=bool)
+    solid[valid] = world.occupied(voxels[valid], solid=True)
+    return solid.any(axis=(1, 2))
+
+class RaycastHit:
+    def __init__(self, block_type, position, normal, distance):
+        self.block_type = block_type
+        self.position = position  # Voxel that was hit
+        self.normal = normal  # Face entered through, None if the ray started inside
+        self.distance = distance
+
+    @property
+    def previous(self):
+        # The empty voxel in front of the face that was hit, where a block would be placed
+        if self.normal is None:
+            return None
+        return tuple(p + n for p, n in zip(self.position, self.normal))
+
+def ray_setup(origin, direction):
+    # Per-axis voxel step, distance to the first voxel boundary and distance
+    # between boundaries along a unit-length direction
+    length = math.sqrt(sum(d * d for d in direction))
+    if not length:
+        return None
+    steps = []
+    t_max = []
+    t_delta = []
+    for o, d in zip(origin, direction):
+        d /= length
+        if d > 0:
+            steps.append(1)
+            t_max.append((math.floor(o) + 1 - o) / d)
+            t_delta.append(1 / d)
+        elif d < 0:
+            steps.append(-1)
+            t_max.append((o - math.floor(o)) / -d)
+            t_delta.append(-1 / d)
+        else:
+            steps.append(0)
+            t_max.append(math.inf)
+            t_delta.append(math.inf)
+    return steps, t_max, t_delta
+
+def raycast(world, origin, direction, max_distance):
+    # Walks the voxels along the ray one at a time (Amanatides & Woo), visiting
+    # each crossed voxel exactly once, and returns a RaycastHit for the first
+    # non-air block within max_distance, or None. Voxels are tested by block
+    # id; the name is only looked up for the block hit.
+    setup = ray_setup(origin, direction)
+    if setup is None:
+        return None
+    steps, t_max, t_delta = setup
+    voxel = [math.floor(o) for o in origin]
+    normal = None
+    distance = 0.0
+    while distance <= max_distance:
+        block_id = world.get_block_id(voxel)
+        if block_id:
+            return RaycastHit(BLOCKS.names[block_id], tuple(voxel), normal, distance)
+        axis = 0 if t_max[0] <= t_max[1] and t_max[0] <= t_max[2] else (1 if t_max[1] <= t_max[2] else 2)
+        voxel[axis] += steps[axis]
+        distance = t_max[axis]
+        t_max[axis] += t_delta[axis]
+        normal = [0, 0, 0]
+        normal[axis] = -steps[axis]
+        normal = tuple(normal)
+    return None
+
+def raycast_many(world, origins, directions, max_distance):
+    # The same traversal for many rays at once, advancing every ray one voxel
+    # per step and looking up all their voxels in one batched query.
+    # Returns arrays (hit, positions, normals, distances); rows of rays that hit
+    # nothing have hit=False, and a zero normal means the ray started inside.
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    count = len(origins)
+    lengths = np.linalg.norm(directions, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        directions = directions / lengths[:, None]
+        steps = np.sign(directions).astype(np.int64)
+        t_delta = np.where(steps != 0, 1 / np.abs(directions), np.inf)
+        voxels = np.floor(origins).astype(np.int64)
+        boundary = np.where(steps > 0, voxels + 1 - origins, origins - voxels)
+        t_max = np.where(steps != 0, boundary * t_delta, np.inf)
+
+    hit = np.zeros(count, dtype=bool)
+    positions = np.zeros((count, 3), dtype=np.int64)
+    normals = np.zeros((count, 3), dtype=np.int64)
+    hit_distances = np.zeros(count, dtype=np.float64)
+    current_normals = np.zeros((count, 3), dtype=np.int64)
+    distances = np.zeros(count, dtype=np.float64)
+    active = np.flatnonzero(lengths > 0)
+    while len(active):
+        found = world.occupied(voxels[active])
+        done = active[found]
+        hit[done] = True
+        positions[done] = voxels[done]
+        normals[done] = current_normals[done]
+        hit_distances[done] = distances[done]
+        active = active[~found]
+
+        axis = np.argmin(t_max[active], axis=1)
+        distances[active] = t_max[active, axis]
+        voxels[active, axis] += steps[active, axis]
+        t_max[active, axis] += t_delta[active, axis]
+        current_normals[active] = 0
+        current_normals[active, axis] = -steps[active, axis]
+        active = active[distances[active] <= max_distance]
+    return hit, positions, normals, hit_distances
@@ -2,18 +2,24 @@ from pyglet.math import Vec3
 from pyglet.window import key
 from pyglet import gl
 import math
+import physics
 from inventory import Inventory
 from crafting import CraftingSystem
+from timestep import lerp
+from blocks import BLOCKS
 
 class Player:
     def __init__(self, position):
         self.position = list(position)  # Store as a list for mutability
+        self.previous_position = list(self.position)  # Position at the end of the previous tick
         self.rotation = Vec3(0.0, 0.0, 0.0)
         self.speed = 5
         self.gravity = -9.8
         self.dy = 0
         self.jump_speed = 5
         self.height = 1.8
+        self.width = 0.6
+        self.on_ground = False
         self.health = 20
         self.max_health = 20
         self.hunger = 20
@@ -31,6 +37,8 @@ class Player:
         self.inventory_open = False
 
     def update(self, dt, keys, world):
+        self.previous_position = list(self.position)
+
         # Apply gravity if not flying
         if not self.flying:
             self.dy += self.gravity * dt
@@ -44,6 +52,7 @@ class Player:
 
         # Update position
         self.move(dt, keys, new_y, world)
+        world.entities.update(self)
 
         # Update cooldowns
         self.mining_cooldown = max(0, self.mining_cooldown - dt)
@@ -73,21 +82,14 @@ class Player:
         dx = strafe * math.cos(rotY) + forward * math.sin(rotY)
         dz = -strafe * math.sin(rotY) + forward * math.cos(rotY)
 
-        # Check for collisions and update position
-        new_x = self.position[0] + dx
-        new_z = self.position[2] + dz
-
-        if not world.collide((new_x, self.position[1], self.position[2])):
-            self.position[0] = new_x
-        if not world.collide((self.position[0], new_y, self.position[2])):
-            self.position[1] = new_y
-            self.jumped = False
-        else:
-            self.position[1] = math.ceil(self.position[1] - 0.5)
+        # Sweep the player's box through the world, stopping at solid blocks
+        result = physics.move(world, self.position, self.width, self.height,
+                              (dx, new_y - self.position[1], dz))
+        self.position = result.position
+        if result.hit(1):
             self.dy = 0
-            self.jumped = False
-        if not world.collide((self.position[0], self.position[1], new_z)):
-            self.position[2] = new_z
+        self.on_ground = result.on_ground
+        self.jumped = not self.on_ground
 
         # Handle jumping
         if keys[key.SPACE] and not self.jumped and not self.flying:
@@ -114,24 +116,21 @@ class Player:
         return (dx, dy, dz)
 
     def get_targeted_block(self, world, max_distance=8):
-        m = 8
+        # Returns the block looked at and the empty block in front of the face
+        # looked at, or (None, None)
         x, y, z = self.position
-        dx, dy, dz = self.get_sight_vector()
-        previous = None
-        for _ in range(max_distance * m):
-            key = (int(x), int(y), int(z))
-            if key != previous and world.get_block(key):
-                return key, previous
-            previous = key
-            x, y, z = x + dx / m, y + dy / m, z + dz / m
-        return None, None
+        hit = world.raycast((x, y + self.height, z), self.get_sight_vector(), max_distance)
+        if hit is None:
+            return None, None
+        return hit.position, hit.previous
 
     def mine(self, world):
         if self.mining_cooldown <= 0:
             target, _ = self.get_targeted_block(world)
             if target:
-                block = world.get_block(target)
-                if block:
+                block_id = world.get_block_id(target)
+                if block_id:
+                    block = BLOCKS.names[block_id]
                     self.inventory.add_item(block)
                     world.remove_block(target)
                     self.mining_cooldown = 0.3
@@ -141,16 +140,15 @@ class Player:
     def place_block(self, block_type, world):
         if self.attack_cooldown <= 0:
             target, previous = self.get_targeted_block(world)
-            if previous:
-                world.add_block(previous, block_type)
+            if previous and world.add_block(previous, block_type):
                 self.attack_cooldown = 0.3
                 return True
         return False
 
-    def attack(self, mobs):
+    def attack(self, world):
         if self.attack_cooldown <= 0:
-            for mob in mobs:
-                if self.distance_to(mob.position) < 2:
+            for mob in world.entities.query_radius(self.position, 2):
+                if mob is not self:
                     mob.take_damage(5)
                     self.attack_cooldown = 0.5
 
@@ -177,10 +175,15 @@ class Player:
 
     def die(self):
         # Implement death behavior (e.g., respawn, drop items)
-        self.position = [0, 20.0, 0]  # Respawn at a default position
+        self.teleport([0, 20.0, 0])  # Respawn at a default position
         self.health = self.max_health
         self.hunger = self.max_hunger
 
+    def teleport(self, position):
+        # Moves without the camera sweeping between the old and new position
+        self.position = list(position)
+        self.previous_position = list(position)
+
     def distance_to(self, position):
         return math.sqrt(sum((a - b) ** 2 for a, b in zip(self.position, position)))
 
@@ -192,11 +195,13 @@ class Player:
     def craft(self, recipe):
         return self.crafting_system.craft(recipe, self.inventory)
 
-    def update_camera(self, window):
+    def update_camera(self, window, alpha=1.0):
+        # alpha: how far the frame is between the previous tick and the last
+        x, y, z = lerp(self.previous_position, self.position, alpha)
         gl.glLoadIdentity()
         gl.glRotatef(-self.rotation.x, 1, 0, 0)
         gl.glRotatef(-self.rotation.y, 0, 1, 0)
-        gl.glTranslatef(-self.position[0], -self.position[1] - self.height, -self.position[2])
+        gl.glTranslatef(-x, -y - self.height, -z)
 
     def draw(self):
         # For now, we won't draw the player model
@@ -0,0 +1,115 @@
+import csv
+import json
+import time
+import numpy as np
+
+# Named timers and counters around the game's subsystems. Timers keep their
+# last WINDOW samples, so percentiles follow what the game is doing now
+# rather than averaging over the whole session. While disabled, timer()
+# hands out one shared do-nothing timer and count() returns at once, so the
+# calls can stay in hot code.
+WINDOW = 600  # Samples kept per timer
+PERCENTILES = (50, 95, 99)
+
+class Timer:
+    # Use as `with PROFILER.timer(name):`. Not re-entrant: the same timer
+    # must not be nested in itself.
+    def __init__(self, window=WINDOW):
+        self.samples = np.zeros(window)
+        self.count = 0  # Samples ever recorded
+        self.total = 0.0
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.add(time.perf_counter() - self.start)
+
+    def add(self, seconds):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        # Milliseconds over the recent samples; count and total cover all of them
+        recent = self.samples[:min(self.count, len(self.samples))] * 1000
+        summary = {'count': self.count, 'total_ms': self.total * 1000}
+        if len(recent):
+            summary['mean_ms'] = float(recent.mean())
+            for percentile, value in zip(PERCENTILES, np.percentile(recent, PERCENTILES).tolist()):
+                summary[f'p{percentile}_ms'] = value
+            summary['max_ms'] = float(recent.max())
+        return summary
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def add(self, seconds):
+        pass
+
+NULL_TIMER = NullTimer()
+
+class Profiler:
+    def __init__(self, enabled=False, window=WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.timers = {}
+        self.counters = {}
+
+    def timer(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = Timer(self.window)
+        return timer
+
+    def add_time(self, name, seconds):
+        # For time measured elsewhere, e.g. on a worker thread
+        self.timer(name).add(seconds)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        self.timers.clear()
+        self.counters.clear()
+
+    def report(self):
+        return {'timers': {name: timer.summary() for name, timer in sorted(self.timers.items())},
+                'counters': dict(sorted(self.counters.items()))}
+
+    def overlay_text(self):
+        lines = [f"{'timer':<18}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}  ms"]
+        for name, summary in self.report()['timers'].items():
+            if 'mean_ms' in summary:
+                lines.append(f"{name:<18}" + ''.join(f"{summary[key]:>8.2f}"
+                                                     for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')))
+        lines.extend(f"{name:<18}{value:>8}" for name, value in sorted(self.counters.items()))
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        # Writes the report as CSV if path ends in .csv, otherwise as JSON
+        report = self.report()
+        if path.endswith('.csv'):
+            fields = ['name', 'kind', 'count', 'total_ms', 'mean_ms'] + [f'p{p}_ms' for p in PERCENTILES] + ['max_ms']
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fields)
+                writer.writeheader()
+                for name, summary in report['timers'].items():
+                    writer.writerow({'name': name, 'kind': 'timer', **summary})
+                for name, value in report['counters'].items():
+                    writer.writerow({'name': name, 'kind': 'counter', 'count': value})
+        else:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+        return path
+
+PROFILER = Profiler()  # Shared by every subsystem; off until the game turns it on
@@ -0,0 +1,230 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+import zlib
+import numpy as np
+
+# Region files pack REGION_SIZE x REGION_SIZE chunks. Each file starts with an
+# offset table of (first sector, byte length) per chunk, followed by the chunks
+# themselves, each zlib-compressed on its own and padded to whole sectors, so
+# any chunk can be read or rewritten without touching the others.
+REGION_SIZE = 32
+SECTOR_SIZE = 4096
+HEADER_ENTRY = struct.Struct('<II')
+HEADER_SIZE = REGION_SIZE * REGION_SIZE * HEADER_ENTRY.size
+HEADER_SECTORS = -(-HEADER_SIZE // SECTOR_SIZE)
+
+def encode_chunk(blocks, palette):
+    meta = json.dumps({'shape': blocks.shape, 'dtype': blocks.dtype.str, 'palette': palette}).encode()
+    return zlib.compress(struct.pack('<I', len(meta)) + meta + blocks.tobytes())
+
+def decode_chunk(data):
+    raw = zlib.decompress(data)
+    (meta_length,) = struct.unpack_from('<I', raw)
+    meta = json.loads(raw[4:4 + meta_length])
+    blocks = np.frombuffer(raw, dtype=np.dtype(meta['dtype']), offset=4 + meta_length)
+    return blocks.reshape(meta['shape']).copy(), meta['palette']
+
+class RegionFile:
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(b'\0' * HEADER_SECTORS * SECTOR_SIZE)
+        self.file = open(path, 'r+b')
+        header = self.file.read(HEADER_SIZE)
+        self.table = [HEADER_ENTRY.unpack_from(header, i * HEADER_ENTRY.size)
+                      for i in range(REGION_SIZE * REGION_SIZE)]
+        self.file.seek(0, os.SEEK_END)
+        self.end_sector = -(-self.file.tell() // SECTOR_SIZE)
+        self.map = None
+        self.unflushed = False
+
+    @staticmethod
+    def index(cx, cz):
+        return (cz % REGION_SIZE) * REGION_SIZE + cx % REGION_SIZE
+
+    def has_chunk(self, cx, cz):
+        return self.table[self.index(cx, cz)][1] > 0
+
+    def read_chunk(self, cx, cz):
+        # Returns (blocks, palette) or None if the chunk was never written
+        sector, length = self.table[self.index(cx, cz)]
+        if not length:
+            return None
+        start = sector * SECTOR_SIZE
+        if self.unflushed:
+            # Buffered writes are not visible through the map until flushed
+            self.file.flush()
+            self.unflushed = False
+        if self.map is None or start + length > len(self.map):
+            # The file grew since it was mapped
+            if self.map is not None:
+                self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return decode_chunk(self.map[start:start + length])
+
+    def write_chunk(self, cx, cz, blocks, palette):
+        return self.write_data(cx, cz, encode_chunk(blocks, palette))
+
+    def write_data(self, cx, cz, data):
+        index = self.index(cx, cz)
+        sector, length = self.table[index]
+        sectors_needed = -(-len(data) // SECTOR_SIZE)
+        if not length or -(-length // SECTOR_SIZE) < sectors_needed:
+            # Does not fit in its old slot: append. The old sectors are left unused.
+            sector = self.end_sector
+            self.end_sector += sectors_needed
+        self.file.seek(sector * SECTOR_SIZE)
+        self.file.write(data + b'\0' * (sectors_needed * SECTOR_SIZE - len(data)))
+        self.file.seek(index * HEADER_ENTRY.size)
+        self.file.write(HEADER_ENTRY.pack(sector, len(data)))
+        self.table[index] = (sector, len(data))
+        self.unflushed = True
+        return len(data)
+
+    def flush(self):
+        self.file.flush()
+        self.unflushed = False
+
+    def sync(self):
+        # Waits for flushed writes to reach the disk
+        try:
+            os.fsync(self.file.fileno())
+        except (ValueError, OSError):
+            pass  # Closed since, which flushed it; nothing more to wait for
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+class RegionStorage:
+    # Chunk storage for one world, spread over region files in a directory.
+    # Safe to use from the main thread and one background saver at once: chunks
+    # can be staged (snapshotted) cheaply and written later by flush_staged,
+    # and staged data is served to readers until it reaches the disk.
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.regions = {}
+        # Region files on disk, so lookups of chunks never saved skip the filesystem
+        self.existing = set()
+        for name in os.listdir(directory):
+            parts = name.split('.')
+            if len(parts) == 4 and parts[0] == 'r' and parts[3] == 'region':
+                self.existing.add((int(parts[1]), int(parts[2])))
+        self.staged = {}  # chunk_pos -> (blocks, palette) waiting to be written
+        self.lock = threading.RLock()
+        self.bytes_written = 0
+
+    def region(self, cx, cz, create=False):
+        region_pos = (cx // REGION_SIZE, cz // REGION_SIZE)
+        region = self.regions.get(region_pos)
+        if region is None:
+            if not create and region_pos not in self.existing:
+                return None
+            path = os.path.join(self.directory, f'r.{region_pos[0]}.{region_pos[1]}.region')
+            region = self.regions[region_pos] = RegionFile(path)
+            self.existing.add(region_pos)
+        return region
+
+    def has_chunk(self, chunk_pos):
+        with self.lock:
+            if chunk_pos in self.staged:
+                return True
+            region = self.region(*chunk_pos)
+            return region is not None and region.has_chunk(*chunk_pos)
+
+    def load_chunk(self, chunk_pos):
+        with self.lock:
+            if chunk_pos in self.staged:
+                blocks, palette = self.staged[chunk_pos]
+                return blocks.copy(), list(palette)
+            region = self.region(*chunk_pos)
+            if region is None:
+                return None
+            return region.read_chunk(*chunk_pos)
+
+    def save_chunk(self, chunk_pos, blocks, palette):
+        # Writes immediately, superseding any staged copy of the chunk
+        data = encode_chunk(blocks, palette)
+        with self.lock:
+            self.staged.pop(chunk_pos, None)
+            return self.write(chunk_pos, data)
+
+    def stage(self, chunk_pos, blocks, palette):
+        # blocks and palette must not be modified afterwards; pass copies
+        with self.lock:
+            self.staged[chunk_pos] = (blocks, palette)
+
+    def flush_staged(self, sync=False):
+        # Compresses and writes every staged chunk. Compression runs outside the
+        # lock so the main thread is only held up for the file writes.
+        # Returns (chunks written, bytes written).
+        with self.lock:
+            staged = list(self.staged.items())
+        chunks = 0
+        written = 0
+        for chunk_pos, entry in staged:
+            data = encode_chunk(*entry)
+            with self.lock:
+                if self.staged.get(chunk_pos) is not entry:
+                    continue  # Superseded by a newer write while compressing
+                del self.staged[chunk_pos]
+                written += self.write(chunk_pos, data)
+                chunks += 1
+        self.flush(sync)
+        return chunks, written
+
+    def write(self, chunk_pos, data):
+        written = self.region(*chunk_pos, create=True).write_data(*chunk_pos, data)
+        self.bytes_written += written
+        return written
+
+    def flush(self, sync=False):
+        # Hands buffered writes to the OS under the lock, since writes seek the
+        # same files, then fsyncs outside it: the main thread takes the lock
+        # every frame to look chunks up and must not wait for the disk
+        with self.lock:
+            regions = list(self.regions.values())
+            for region in regions:
+                region.flush()
+        if sync:
+            for region in regions:
+                region.sync()
+
+    def close(self):
+        with self.lock:
+            for region in self.regions.values():
+                region.close()
+            self.regions.clear()
+
+    def copy_to(self, directory):
+        # A storage in directory holding everything saved or staged here, for
+        # saving the same world under another name. Whatever was saved in
+        # directory before is deleted.
+        target = RegionStorage(directory)
+        target.clear()
+        with self.lock:
+            for region in self.regions.values():
+                region.flush()
+            for region_x, region_z in self.existing:
+                name = f'r.{region_x}.{region_z}.region'
+                shutil.copyfile(os.path.join(self.directory, name), os.path.join(directory, name))
+                target.existing.add((region_x, region_z))
+            target.staged.update(self.staged)  # Staged snapshots are never modified
+        return target
+
+    def clear(self):
+        # Deletes every region file, e.g. when a new world is saved over an old one
+        self.close()
+        with self.lock:
+            self.staged.clear()
+            for region_x, region_z in self.existing:
+                os.remove(os.path.join(self.directory, f'r.{region_x}.{region_z}.region'))
+            self.existing.clear()
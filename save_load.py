@@ -1,26 +1,53 @@
 import json
 import os
-import pickle
+import shutil
+import threading
+import time
+from pyglet.math import Vec3
+from profiler import PROFILER
+from region import RegionStorage
 
 class SaveLoadManager:
+    # The JSON file holds the player, seed and mobs. Edited chunks live in region
+    # files next to it; untouched chunks are regenerated from the seed.
+    @staticmethod
+    def region_directory(filename):
+        return os.path.splitext(filename)[0] + '_regions'
+
     @staticmethod
     def save_game(player, world, mobs, filename='save.json'):
+        save_data, storage = SaveLoadManager.prepare_save(player, world, mobs, filename)
+        saved_chunks, _ = SaveLoadManager.write_save(save_data, storage, filename)
+        print(f"Game saved to {filename} ({saved_chunks} chunks written to {storage.directory})")
+
+    @staticmethod
+    def prepare_save(player, world, mobs, filename='save.json'):
+        # Main-thread half of a save: snapshots the edited chunks into the world's
+        # storage and copies the player and mob state. Cheap enough to run
+        # between frames; write_save does the slow part.
+        chunks = world.snapshot_modified_chunks()
+        directory = SaveLoadManager.region_directory(filename)
+        if world.storage is None:
+            storage = RegionStorage(directory)
+            storage.clear()  # Whatever was saved here belongs to another world
+            world.attach_storage(storage)
+        elif world.storage.directory != directory:
+            # Saving under another name: chunks saved before, including ones
+            # since unloaded, move along with the world
+            world.attach_storage(world.storage.copy_to(directory))
+        for chunk_pos, blocks, names in chunks:
+            world.storage.stage(chunk_pos, blocks, names)
+
         save_data = {
             'player': {
                 'position': list(player.position),
                 'rotation': list(player.rotation),
                 'health': player.health,
                 'hunger': player.hunger,
-                'inventory': player.inventory.slots,
+                'inventory': list(player.inventory.slots),
             },
             'world': {
                 'seed': world.seed,
-                'modified_blocks': [
-                    {'position': list(pos), 'block_type': block.block_type}
-                    for chunk in world.chunks.values()
-                    for pos, block in chunk.blocks.items()
-                    if block.block_type != world.get_default_block_type(pos)
-                ]
             },
             'mobs': [
                 {
@@ -31,49 +58,51 @@ class SaveLoadManager:
                 for mob in mobs
             ]
         }
+        return save_data, world.storage
 
-        with open(filename, 'w') as f:
-            json.dump(save_data, f, indent=2)
-
-        # Save larger data separately using pickle
-        with open(filename + '.pkl', 'wb') as f:
-            pickle.dump(world.chunks, f)
-
-        print(f"Game saved to {filename} and {filename}.pkl")
+    @staticmethod
+    def write_save(save_data, storage, filename='save.json'):
+        # Writes what prepare_save staged and fsyncs it. Safe to run on a
+        # background thread. Returns (chunks written, bytes written).
+        saved_chunks, written = storage.flush_staged(sync=True)
+        data = json.dumps(save_data, indent=2).encode()
+        temp_filename = filename + '.tmp'
+        with open(temp_filename, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, filename)
+        return saved_chunks, written + len(data)
 
     @staticmethod
     def load_game(filename='save.json'):
-        if not os.path.exists(filename) or not os.path.exists(filename + '.pkl'):
+        if not os.path.exists(filename):
             print("No save file found.")
             return None
 
         with open(filename, 'r') as f:
             save_data = json.load(f)
 
-        # Load larger data using pickle
-        with open(filename + '.pkl', 'rb') as f:
-            chunks = pickle.load(f)
+        # Chunks are read from here on demand as the world loads them
+        save_data['world']['regions'] = SaveLoadManager.region_directory(filename)
 
-        save_data['world']['chunks'] = chunks
-
-        print(f"Game loaded from {filename} and {filename}.pkl")
+        print(f"Game loaded from {filename}")
         return save_data
 
     @staticmethod
     def apply_loaded_data(save_data, player, world, mob_manager):
         # Apply player data
-        player.position = save_data['player']['position']
-        player.rotation = save_data['player']['rotation']
+        player.teleport(save_data['player']['position'])
+        player.rotation = Vec3(*save_data['player']['rotation'])
         player.health = save_data['player']['health']
         player.hunger = save_data['player']['hunger']
-        player.inventory.slots = save_data['player']['inventory']
+        player.inventory.slots = [tuple(slot) if slot else None for slot in save_data['player']['inventory']]
 
         # Apply world data
         world.seed = save_data['world']['seed']
-        world.chunks = save_data['world']['chunks']
-        
-        # Regenerate any missing chunks
-        world.ensure_chunks_around_player(player)
+        world.regenerate()
+        world.attach_storage(RegionStorage(save_data['world']['regions']))
+        world.ensure_chunks_around_player(player.position, blocking=True)
 
         # Apply mob data
         mob_manager.mobs.clear()
@@ -81,28 +110,69 @@ class SaveLoadManager:
             mob_type = getattr(__import__('mobs'), mob_data['type'])
             mob = mob_type(mob_data['position'])
             mob.health = mob_data['health']
-            mob_manager.mobs.append(mob)
+            mob_manager.mobs.add(mob)
 
     @staticmethod
     def delete_save(filename='save.json'):
         if os.path.exists(filename):
             os.remove(filename)
-        if os.path.exists(filename + '.pkl'):
-            os.remove(filename + '.pkl')
-        print(f"Save files {filename} and {filename}.pkl deleted.")
+        directory = SaveLoadManager.region_directory(filename)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        print(f"Save file {filename} and {directory} deleted.")
 
 class AutoSave:
-    def __init__(self, game, interval=300):  # 5 minutes default
+    # Saves only the chunks edited since the last save. The main thread just
+    # snapshots them; compression, writing and fsync happen on a background
+    # thread while the game keeps running.
+    def __init__(self, game, interval=300, filename='save.json'):  # 5 minutes default
         self.game = game
         self.interval = interval
+        self.filename = filename
         self.time_since_last_save = 0
+        self.thread = None
+        self.stats = {
+            'saves': 0,
+            'chunks_flushed': 0,
+            'bytes_written': 0,
+            'pause_time': 0.0,  # Main-thread time of the last save, in seconds
+            'max_pause_time': 0.0,
+            'write_time': 0.0,  # Background time of the last save, in seconds
+        }
 
     def update(self, dt):
         self.time_since_last_save += dt
-        if self.time_since_last_save >= self.interval:
-            self.save()
+        if self.time_since_last_save >= self.interval and self.save():
             self.time_since_last_save = 0
 
     def save(self):
-        SaveLoadManager.save_game(self.game.player, self.game.world, self.game.mobs)
-        print("Auto-save completed.")
\ No newline at end of file
+        if self.thread is not None and self.thread.is_alive():
+            return False  # Still writing the previous save; try again next frame
+        start = time.perf_counter()
+        save_data, storage = SaveLoadManager.prepare_save(self.game.player, self.game.world, self.game.mobs, self.filename)
+        pause_time = time.perf_counter() - start
+        self.stats['pause_time'] = pause_time
+        self.stats['max_pause_time'] = max(self.stats['max_pause_time'], pause_time)
+        PROFILER.add_time('save pause', pause_time)
+        self.thread = threading.Thread(target=self.write, args=(save_data, storage), daemon=True)
+        self.thread.start()
+        return True
+
+    def write(self, save_data, storage):
+        start = time.perf_counter()
+        try:
+            chunks, written = SaveLoadManager.write_save(save_data, storage, self.filename)
+        except OSError as e:
+            print(f"Auto-save failed: {e}")
+            return
+        self.stats['write_time'] = time.perf_counter() - start
+        PROFILER.add_time('save write', self.stats['write_time'])
+        self.stats['saves'] += 1
+        self.stats['chunks_flushed'] += chunks
+        self.stats['bytes_written'] += written
+        print(f"Auto-save completed: {chunks} chunks, {written} bytes, "
+              f"{self.stats['pause_time'] * 1000:.1f} ms on the main thread.")
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
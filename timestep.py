@@ -0,0 +1,41 @@
+TICK_RATE = 60  # Simulation ticks per second
+MAX_CATCH_UP = 5  # Most ticks run for one frame
+
+class FixedTimestep:
+    # Runs the simulation in ticks of a fixed length however long frames take.
+    # Frame time is banked in an accumulator and spent a whole tick at a time;
+    # what is left over, as a fraction of a tick (alpha), tells the renderer
+    # how far to interpolate between the last two ticks. After a long stall
+    # only max_steps ticks are run and the rest of the backlog is dropped, so
+    # a slow frame cannot snowball into ever more ticks per frame.
+    def __init__(self, step, tick_rate=TICK_RATE, max_steps=MAX_CATCH_UP):
+        self.step = step  # Called with the tick length
+        self.dt = 1 / tick_rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.frame_ticks = 0  # Ticks run for the last frame
+        self.dropped = 0.0  # Seconds of simulation skipped to catch up
+
+    def advance(self, dt):
+        # Call once per frame with the frame time; returns the ticks run
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= self.dt and steps < self.max_steps:
+            self.step(self.dt)
+            self.accumulator -= self.dt
+            steps += 1
+        if self.accumulator >= self.dt:
+            backlog = self.accumulator - self.accumulator % self.dt
+            self.dropped += backlog
+            self.accumulator -= backlog
+        self.ticks += steps
+        self.frame_ticks = steps
+        return steps
+
+    @property
+    def alpha(self):
+        return min(self.accumulator / self.dt, 1.0)
+
+def lerp(previous, current, alpha):
+    return [a + (b - a) * alpha for a, b in zip(previous, current)]
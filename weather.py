@@ -1,16 +1,45 @@
 import random
+import numpy as np
+from pyglet import gl
+
+# Particles live in preallocated arrays used as a ring buffer: new particles
+# overwrite the oldest slots, and those that fell out of range are hidden until
+# their slot comes round again. They fill a box around the player and wrap
+# horizontally as the player moves. The particles are stored directly as the
+# vertex array that is drawn, so nothing is rebuilt per frame.
+MAX_PARTICLES = 50000
+SPAWN_RADIUS = 20  # Half the width of the box around the player
+SPAWN_HEIGHT = 20  # Particles appear this far above the player...
+FALL_DEPTH = 8  # ...and die this far below
+STREAK_LENGTH = 4  # Rain streak length per unit of particle size
+HIDDEN_Y = -1e6  # Dead particles are moved beyond the far clip plane
+COLORS = {'rain': (0.6, 0.6, 0.9), 'snow': (1.0, 1.0, 1.0)}
 
 class WeatherSystem:
-    def __init__(self, window):
+    def __init__(self, window, capacity=MAX_PARTICLES):
         self.window = window
-        self.particles = []
+        self.capacity = capacity
+        # Two vertices per particle: its position and the top of its rain
+        # streak. Rain draws them as GL_LINES, snow only the first as GL_POINTS.
+        self.vertices = np.full((capacity, 2, 3), HIDDEN_Y, dtype=np.float32)
+        self.speeds = np.zeros(capacity, dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.scratch = np.zeros(capacity, dtype=np.float32)
+        self.head = 0  # Next slot to spawn into
+        self.spawn_due = 0.0  # Fraction of a particle owed from earlier frames
+        self.center = None  # Player position the box was last centred on
+        self.rng = np.random.default_rng()
         self.weather_type = 'clear'
         self.weather_intensity = 0
         self.change_weather()
         self.weather_duration = random.uniform(60, 300)  # Weather lasts between 1-5 minutes
         self.time_elapsed = 0
 
-    def update(self, dt):
+    @property
+    def particle_count(self):
+        return int(np.count_nonzero(self.alive))
+
+    def update(self, dt, position):
         self.time_elapsed += dt
         if self.time_elapsed >= self.weather_duration:
             self.change_weather()
@@ -18,36 +47,89 @@ class WeatherSystem:
             self.weather_duration = random.uniform(60, 300)
 
         if self.weather_type != 'clear':
-            self.update_particles(dt)
+            self.update_particles(dt, position)
             if random.random() < 0.001:
                 self.change_weather()
 
     def change_weather(self):
         self.weather_type = random.choice(['clear', 'rain', 'snow'])
         self.weather_intensity = random.uniform(0.2, 1.0)
-        self.particles.clear()
-
-    def update_particles(self, dt):
-        # Remove particles that are out of view
-        self.particles = [p for p in self.particles if p.y > 0]
-
-        # Add new particles
-        if len(self.particles) < 1000 * self.weather_intensity:
-            x = random.uniform(-20, 20)  # Spawn particles in a 40x40 area around the player
-            y = 20  # Start particles above the player's view
-            z = random.uniform(-20, 20)
-            speed = random.uniform(7, 13) * self.weather_intensity
-            self.particles.append(WeatherParticle(x, y, z, speed))
-
-        # Update particle positions
-        for particle in self.particles:
-            particle.update(dt)
+        self.clear_particles()
+
+    def clear_particles(self):
+        self.alive[:] = False
+        self.vertices[:] = HIDDEN_Y
+        self.spawn_due = 0.0
+        self.center = None  # Refill the whole box on the next update
+
+    def target_count(self):
+        return int(self.capacity * self.weather_intensity)
+
+    def spawn(self, count, position, heights):
+        # Writes count particles into the next slots of the ring, at the given
+        # heights above the bottom of the box
+        count = min(count, self.capacity)
+        slots = (self.head + np.arange(count)) % self.capacity
+        self.head = (self.head + count) % self.capacity
+        x, y, z = position
+        offsets = self.rng.uniform(-SPAWN_RADIUS, SPAWN_RADIUS, (count, 2))
+        particles = self.vertices[slots]
+        particles[:, :, 0] = x + offsets[:, 0, None]
+        particles[:, :, 1] = y - FALL_DEPTH + heights[:, None]
+        particles[:, :, 2] = z + offsets[:, 1, None]
+        particles[:, 1, 1] += self.rng.uniform(0.1, 0.3, count) * STREAK_LENGTH
+        self.vertices[slots] = particles
+        self.speeds[slots] = self.rng.uniform(7, 13, count) * self.weather_intensity
+        self.alive[slots] = True
+
+    def update_particles(self, dt, position):
+        x, y, z = position
+        if self.center is not None and max(abs(x - self.center[0]), abs(z - self.center[2])) > SPAWN_RADIUS:
+            self.clear_particles()  # Teleported: the old box is out of reach
+        if self.center is None:
+            # Weather just started: fill the whole box rather than waiting for
+            # the first particles to fall through it
+            count = self.target_count()
+            self.spawn(count, position, self.rng.uniform(0, SPAWN_HEIGHT + FALL_DEPTH, count))
+        else:
+            # Spawn at the rate particles fall out of the box, so about
+            # target_count stay alive
+            lifetime = (SPAWN_HEIGHT + FALL_DEPTH) / (10 * self.weather_intensity)
+            self.spawn_due += self.target_count() * dt / lifetime
+            count = int(self.spawn_due)
+            self.spawn_due -= count
+            self.spawn(count, position, np.full(count, SPAWN_HEIGHT + FALL_DEPTH))
+        self.center = (x, y, z)
+
+        vertices = self.vertices
+        np.multiply(self.speeds, dt, out=self.scratch)
+        for end in (0, 1):
+            vertices[:, end, 1] -= self.scratch
+        # Keep the box centred on the player: particles left behind reappear on
+        # the opposite side. Only a few cross each frame, so they are moved by
+        # index rather than with a pass over every particle.
+        for axis, center in ((0, x), (2, z)):
+            vertices[np.flatnonzero(vertices[:, 0, axis] > center + SPAWN_RADIUS), :, axis] -= 2 * SPAWN_RADIUS
+            vertices[np.flatnonzero(vertices[:, 0, axis] < center - SPAWN_RADIUS), :, axis] += 2 * SPAWN_RADIUS
+        dead = np.flatnonzero(self.alive & (vertices[:, 0, 1] < y - FALL_DEPTH))
+        self.alive[dead] = False
+        vertices[dead, :, 1] = HIDDEN_Y
 
     def draw(self):
-        # Simplified drawing without textures
-        if self.weather_type != 'clear':
-            for particle in self.particles:
-                particle.draw(self.weather_type)
+        # All slots are drawn in one call; dead ones are out of view
+        if self.weather_type == 'clear':
+            return
+        gl.glColor3f(*COLORS[self.weather_type])
+        gl.glPointSize(3)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        if self.weather_type == 'rain':
+            gl.glVertexPointer(3, gl.GL_FLOAT, 0, self.vertices.ctypes.data)
+            gl.glDrawArrays(gl.GL_LINES, 0, 2 * self.capacity)
+        else:
+            # Every other vertex: the particles without their streak tops
+            gl.glVertexPointer(3, gl.GL_FLOAT, self.vertices.strides[0], self.vertices.ctypes.data)
+            gl.glDrawArrays(gl.GL_POINTS, 0, self.capacity)
+        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
 
     def get_weather_type(self):
         return self.weather_type
@@ -55,23 +137,6 @@ class WeatherSystem:
     def get_weather_intensity(self):
         return self.weather_intensity
 
-class WeatherParticle:
-    def __init__(self, x, y, z, speed):
-        self.x = x
-        self.y = y
-        self.z = z
-        self.speed = speed
-        self.size = random.uniform(0.1, 0.3)
-
-    def update(self, dt):
-        self.y -= self.speed * dt
-        if self.y < 0:
-            self.y = 20  # Reset height when particle reaches the ground
-
-    def draw(self, weather_type):
-        # Simplified drawing without OpenGL
-        pass
-
 class WeatherEffects:
     def __init__(self, sound_manager):
         self.sound_manager = sound_manager